@@ -1,13 +1,17 @@
 import os
 import logging
+import logging.handlers
+import atexit
 import re
 import datetime
 import pandas as pd
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, session, redirect, url_for, abort, make_response
+from flask import Flask, render_template, request, session, redirect, url_for, abort, make_response, jsonify, Response, stream_with_context, g, has_request_context
 import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1 import FieldFilter
+from google.api_core import exceptions as google_exceptions
+from google.api_core.retry import Retry
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -24,9 +28,38 @@ from langchain.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage
 import signal
 import sys
+import hashlib
+import gzip
+import threading
+import time
+from collections import OrderedDict, Counter, deque
+import bisect
+import hmac
+import math
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import sqlite3
+import resource
+from contextlib import contextmanager
+from werkzeug.middleware.proxy_fix import ProxyFix
+import queue
+import click
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Brotli is optional; responses fall back to gzip when it isn't installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# pyarrow is optional; only needed for Parquet exports
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Logging is configured once the environment is loaded (see the logging pipeline below)
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
@@ -35,9 +68,95 @@ template_dir = os.path.join(BASE_DIR, "templates")
 app = Flask(__name__, template_folder=template_dir)
 app.secret_key = os.getenv("SECRET_KEY", "supersecretkey")
 app.permanent_session_lifetime = timedelta(minutes=30)
+# Behind a reverse proxy (e.g. Render) trust one X-Forwarded-For hop so rate limits see client IPs
+if os.getenv("TRUST_PROXY"):
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
 
 # Load environment variables
 load_dotenv()
+
+# Logging pipeline. Request threads only enqueue records; a QueueListener thread formats and writes them,
+# so a slow stderr never adds latency to a request. Records are JSON lines (LOG_FORMAT=text for plain lines)
+# tagged with the request ID, session ID, route and time since the request started. Messages are formatted
+# on the listener, so pass arguments %-style rather than as f-strings on hot paths. High-volume info logs are
+# marked with extra={"sampled": True} and only LOG_SAMPLE_RATE of them are kept.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+log_stats = {"dropped": 0, "sampled_out": 0}
+
+class RequestContextFilter(logging.Filter):
+    # Runs on the logging thread's caller, where the Flask request context is still available
+    def filter(self, record):
+        if getattr(record, "sampled", False) and record.levelno <= logging.INFO and random.random() >= LOG_SAMPLE_RATE:
+            log_stats["sampled_out"] += 1
+            return False
+        if has_request_context():
+            record.request_id = g.get("request_id")
+            record.route = request.endpoint
+            record.session_id = (request.view_args or {}).get("session_id") or session.get("session_id")
+            started = g.get("request_started")
+            if started is not None:
+                record.elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        return True
+
+class AsyncLogHandler(logging.handlers.QueueHandler):
+    # Unlike QueueHandler, leave msg/args unformatted; the listener formats them
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_stats["dropped"] += 1
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_FIELDS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+log_pipeline = {"handler": None, "output": None, "listener": None}
+
+# Give the handler a fresh queue and start a listener thread writing it to the output
+def start_log_listener():
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    log_pipeline["handler"].queue = log_queue
+    log_pipeline["listener"] = logging.handlers.QueueListener(log_queue, log_pipeline["output"], respect_handler_level=True)
+    log_pipeline["listener"].start()
+
+def configure_logging():
+    handler = AsyncLogHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RequestContextFilter())
+    output = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonLogFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    log_pipeline.update(handler=handler, output=output)
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    start_log_listener()
+    # Threads do not survive fork: a worker forked after import (gunicorn --preload) would queue records that
+    # nothing writes, so each child starts its own listener on a new queue
+    os.register_at_fork(after_in_child=start_log_listener)
+    # Flush whatever is still queued on exit (sys.exit from handle_shutdown included)
+    atexit.register(lambda: log_pipeline["listener"].stop())
+
+configure_logging()
 GEMINI_API_KEYS = [
     os.getenv("GEMINI_API_KEY1"),
     os.getenv("GEMINI_API_KEY2"),
@@ -49,9 +168,11 @@ GEMINI_API_KEY = next((key for key in GEMINI_API_KEYS if key), None)
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASS = os.getenv("EMAIL_PASS")
 FIREBASE_CREDENTIALS_JSON = os.getenv("FIREBASE_CREDENTIALS_JSON")
+# "record" appends every Gemini evaluation to EVAL_CASSETTE_PATH; "replay" serves evaluations from it
+EVAL_CASSETTE_MODE = os.getenv("EVAL_CASSETTE_MODE", "off").lower()
 
 # Validate critical environment variables
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and EVAL_CASSETTE_MODE != "replay":
     logger.error("No valid GEMINI_API_KEY provided")
     raise ValueError("Missing GEMINI_API_KEY")
 if not EMAIL_USER or not EMAIL_PASS:
@@ -63,7 +184,34 @@ if not FIREBASE_CREDENTIALS_JSON:
 
 # Google Sheet configuration
 SHEET_ID = "1C8WBBdpZYdbiCTh9_GgTgCG-wjIl4YZj4EnxP689R7U"
-SHEET_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=csv&gid=0"
+
+# Question banks, e.g. QUESTION_BANKS="finance=<sheet id>,ops=<sheet id>:<gid>,analytics=https://.../bank.csv".
+# Each bank is loaded from its own source on first use and kept in an LRU bounded by BANK_CACHE_MAX_BYTES;
+# the BANK_PIN_COUNT most used banks are never evicted.
+def parse_question_banks(value):
+    banks = {}
+    for item in value.split(","):
+        name, _, source = item.strip().partition("=")
+        if name.strip() and source.strip():
+            banks[name.strip().lower()] = source.strip()
+    return banks
+
+QUESTION_BANKS = parse_question_banks(os.getenv("QUESTION_BANKS", "")) or {"default": SHEET_ID}
+DEFAULT_BANK = os.getenv("DEFAULT_BANK", next(iter(QUESTION_BANKS))).lower()
+BANK_CACHE_MAX_BYTES = int(os.getenv("BANK_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+BANK_PIN_COUNT = int(os.getenv("BANK_PIN_COUNT", "3"))
+BANK_LOAD_TIMEOUT = 15
+BANK_RETRY_INTERVAL = 60  # seconds before a bank that failed to load is fetched again
+BANK_SNAPSHOT_CACHE_SIZE = 32
+question_banks = OrderedDict()
+bank_snapshots = OrderedDict()  # (bank, version) -> questions of an older bank version
+bank_usage = {}
+bank_locks = {name: threading.Lock() for name in QUESTION_BANKS}
+question_banks_lock = threading.Lock()
+
+if DEFAULT_BANK not in QUESTION_BANKS:
+    logger.error("DEFAULT_BANK %s is not listed in QUESTION_BANKS", DEFAULT_BANK)
+    raise ValueError("Invalid DEFAULT_BANK")
 
 # Initialize Firebase
 db = None
@@ -75,30 +223,261 @@ try:
     db = firestore.client()
     logger.info("Firebase initialized successfully")
 except Exception as e:
-    logger.error(f"Error initializing Firebase: {str(e)}")
+    logger.error("Error initializing Firebase: %s", e)
     raise ValueError("Failed to initialize Firebase")
 
-# Load questions lazily from Google Sheet (cached to reduce internet usage)
-def get_questions():
-    if not hasattr(get_questions, 'cache'):
-        try:
-            response = requests.get(SHEET_URL)
-            response.raise_for_status()
-            df = pd.read_csv(io.StringIO(response.text))
-            if 'q' not in df.columns or 'exp' not in df.columns:
-                raise ValueError("Google Sheet must have 'q' and 'exp' columns")
-            df = df[['q', 'exp']].dropna()
-            get_questions.cache = df.to_dict(orient="records")
-            logger.info(f"Loaded {len(get_questions.cache)} questions from Google Sheet")
-        except Exception as e:
-            logger.error(f"Error loading questions from Google Sheet: {str(e)}")
-            get_questions.cache = []
-    return get_questions.cache
+# A bank source is a Google Sheet ID (optionally "<id>:<gid>") or a URL serving CSV
+def bank_source_url(source):
+    if source.startswith(("http://", "https://")):
+        return source
+    sheet_id, _, gid = source.partition(":")
+    return f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid or 0}"
+
+# Load one question bank from its source; the version is a hash of its questions and expected answers
+def load_question_bank(name):
+    try:
+        with dependency_deadline("sheets") as timeout:
+            response = requests.get(bank_source_url(QUESTION_BANKS[name]), timeout=timeout)
+        response.raise_for_status()
+        df = pd.read_csv(io.StringIO(response.text))
+        if 'q' not in df.columns or 'exp' not in df.columns:
+            raise ValueError("Google Sheet must have 'q' and 'exp' columns")
+        df = df[['q', 'exp']].dropna()
+        bank_questions = df.to_dict(orient="records")
+        logger.info("Loaded %d questions for bank %s", len(bank_questions), name)
+    except DeadlineExceeded as e:
+        # Under a request deadline the fetch timeout was cut to the remaining budget, so a timeout says
+        # nothing about the source; only cache an empty bank when the full BANK_LOAD_TIMEOUT ran out
+        if request_deadline() is not None:
+            raise
+        logger.error("Error loading question bank %s: %s", name, e)
+        bank_questions = []
+    except Exception as e:
+        logger.error("Error loading question bank %s: %s", name, e)
+        bank_questions = []
+    digest = hashlib.sha1()
+    for q in bank_questions:
+        digest.update(f"{q['q']}\0{q['exp']}\0".encode("utf-8"))
+    return {
+        "name": name,
+        "questions": bank_questions,
+        "version": digest.hexdigest()[:12],
+        "size": sum(sys.getsizeof(q) + sys.getsizeof(q["q"]) + sys.getsizeof(q["exp"]) for q in bank_questions),
+        "loaded_at": time.time()
+    }
+
+def bank_is_fresh(bank):
+    return bank is not None and (bank["questions"] or time.time() - bank["loaded_at"] < BANK_RETRY_INTERVAL)
+
+# Drop least recently used banks until the cache fits BANK_CACHE_MAX_BYTES, skipping the most used ones.
+# Caller holds question_banks_lock.
+def evict_question_banks():
+    pinned = set(sorted(bank_usage, key=bank_usage.get, reverse=True)[:BANK_PIN_COUNT])
+    total = sum(bank["size"] for bank in question_banks.values())
+    for name in list(question_banks):
+        if total <= BANK_CACHE_MAX_BYTES:
+            break
+        if name in pinned:
+            continue
+        total -= question_banks.pop(name)["size"]
+        logger.info("Evicted question bank %s from cache", name)
+
+# Bank by name (unknown names fall back to DEFAULT_BANK), loading it on first use
+def get_bank(name):
+    name = name if name in QUESTION_BANKS else DEFAULT_BANK
+    with question_banks_lock:
+        bank = question_banks.get(name)
+        if bank_is_fresh(bank):
+            question_banks.move_to_end(name)
+            return bank
+    # One loader per bank; concurrent requests for the same bank wait for it
+    with bank_locks[name]:
+        with question_banks_lock:
+            bank = question_banks.get(name)
+            if bank_is_fresh(bank):
+                return bank
+        # Another worker on this host may have loaded it already
+        shared = get_shared_cache()
+        bank = shared.get_bank(name) if shared is not None else None
+        if bank is None:
+            bank = load_question_bank(name)
+            if bank["questions"]:
+                save_bank_snapshot(bank)
+                if shared is not None:
+                    shared.put_bank(bank)
+        with question_banks_lock:
+            question_banks[name] = bank
+            question_banks.move_to_end(name)
+            evict_question_banks()
+        if bank["questions"]:
+            start_rubric_job(bank)
+    return bank
+
+# Keep every bank version in question_bank_versions so interviews can refer to questions by ID
+def save_bank_snapshot(bank):
+    try:
+        with firestore_deadline() as options:
+            db.collection("question_bank_versions").document(f"{bank['name']}_{bank['version']}").set({
+                "bank": bank["name"],
+                "version": bank["version"],
+                "questions": [{"id": question_key(q["q"]), "q": q["q"], "exp": q["exp"]} for q in bank["questions"]],
+                "saved_at": firestore.SERVER_TIMESTAMP
+            }, **options)
+    except Exception as e:
+        logger.error("Error saving snapshot of question bank %s: %s", bank['name'], e)
+
+# Questions of a specific bank version: the loaded bank when it matches, else its saved snapshot
+def bank_version_questions(name, version):
+    bank = get_bank(name)
+    if not version or bank["version"] == version:
+        return bank["questions"]
+    key = (bank["name"], version)
+    with question_banks_lock:
+        cached = bank_snapshots.get(key)
+        if cached is not None:
+            bank_snapshots.move_to_end(key)
+            return cached
+    try:
+        with firestore_deadline() as options:
+            snapshot = db.collection("question_bank_versions").document(f"{bank['name']}_{version}").get(**options)
+    except Exception as e:
+        logger.error("Error loading question bank %s version %s: %s", bank['name'], version, e)
+        return bank["questions"]
+    if not snapshot.exists:
+        logger.warning("No snapshot of question bank %s version %s; using the current bank", bank['name'], version)
+        return bank["questions"]
+    snapshot_data = snapshot.to_dict()
+    snapshot_questions = snapshot_data.get("questions", [])
+    remember_rubrics(snapshot_data.get("rubrics", {}))
+    with question_banks_lock:
+        bank_snapshots[key] = snapshot_questions
+        while len(bank_snapshots) > BANK_SNAPSHOT_CACHE_SIZE:
+            bank_snapshots.popitem(last=False)
+    return snapshot_questions
+
+def record_bank_use(name):
+    with question_banks_lock:
+        bank_usage[name] = bank_usage.get(name, 0) + 1
 
-questions = get_questions()
-num_questions = len(questions)
 MAX_SCORE = 10
 
+# Response caching and compression settings
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "256"))
+LEADERBOARD_CACHE_TTL = int(os.getenv("LEADERBOARD_CACHE_TTL", "60"))
+STATIC_MAX_AGE = 365 * 24 * 3600
+COMPRESS_MIN_SIZE = 500
+render_cache = OrderedDict()
+render_cache_lock = threading.Lock()
+asset_versions = {}
+leaderboard_state = {"data": None, "loaded_at": 0.0, "generation": 0}
+leaderboard_lock = threading.Lock()
+
+# Leaderboard pagination (entries live in the flat "leaderboard" collection, one doc per user)
+LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", "25"))
+LEADERBOARD_MAX_PAGE_SIZE = 100
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Sorted latest score per user for O(log n) rank/percentile lookups (reloaded from storage periodically
+# by a background thread so scores recorded by other workers show up; requests only read it)
+RANKING_RELOAD_INTERVAL = int(os.getenv("RANKING_RELOAD_INTERVAL", "300"))
+score_ranking = {"scores": [], "by_user": {}, "loaded_at": None, "refreshing": False, "recorded": {}}
+score_ranking_lock = threading.Lock()
+
+# Post-interview bookkeeping (question statistics) runs off the request thread
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "2"))
+background_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background")
+
+# Interview mode: "sequential" serves every question in sheet order; "adaptive" picks the most
+# informative next question from question_stats and stops once the skill estimate is confident
+INTERVIEW_MODE = os.getenv("INTERVIEW_MODE", "sequential")
+ADAPTIVE_MIN_QUESTIONS = int(os.getenv("ADAPTIVE_MIN_QUESTIONS", "4"))
+ADAPTIVE_TARGET_SE = float(os.getenv("ADAPTIVE_TARGET_SE", "0.75"))
+ADAPTIVE_MIN_SAMPLES = 5  # graded answers needed before a question's statistics are trusted
+ADAPTIVE_NOISE_SD = float(os.getenv("ADAPTIVE_NOISE_SD", "1.5"))  # prior guess of one answer's score noise
+ADAPTIVE_NOISE_PRIOR_WEIGHT = 2  # pseudo-answers behind ADAPTIVE_NOISE_SD against the candidate's own residuals
+DIFFICULTY_CACHE_TTL = int(os.getenv("DIFFICULTY_CACHE_TTL", "600"))
+DEFAULT_QUESTION_SD = MAX_SCORE * 0.3
+difficulty_state = {"data": None, "loaded_at": 0.0}
+difficulty_lock = threading.Lock()
+
+# Admission control for LLM evaluations: at most EVAL_MAX_IN_FLIGHT run at once, up to EVAL_MAX_QUEUE
+# more wait EVAL_QUEUE_TIMEOUT seconds for a slot, everything else gets 429 + Retry-After.
+# Token buckets per session and per client IP stop one client from starving the rest.
+EVAL_MAX_IN_FLIGHT = int(os.getenv("EVAL_MAX_IN_FLIGHT", "8"))
+EVAL_MAX_QUEUE = int(os.getenv("EVAL_MAX_QUEUE", "16"))
+EVAL_QUEUE_TIMEOUT = float(os.getenv("EVAL_QUEUE_TIMEOUT", "5"))
+EVAL_RETRY_AFTER = int(os.getenv("EVAL_RETRY_AFTER", "5"))
+SESSION_RATE = float(os.getenv("SESSION_RATE", "0.2"))  # evaluations per second
+SESSION_BURST = int(os.getenv("SESSION_BURST", "3"))
+IP_RATE = float(os.getenv("IP_RATE", "2"))  # campus drives share one NAT address
+IP_BURST = int(os.getenv("IP_BURST", "20"))
+RATE_LIMIT_MAX_KEYS = 10000
+eval_slots = threading.Semaphore(EVAL_MAX_IN_FLIGHT)
+rate_buckets = OrderedDict()
+rate_limit_lock = threading.Lock()
+
+# Single-flight answer evaluation keyed by (session_id, attempt, step): concurrent duplicates share the one
+# in-flight call, and results are stored (locally and on the session document) for late duplicates
+GRADED_CACHE_SIZE = 10000
+SINGLE_FLIGHT_WAIT = 120
+inflight_evaluations = {}
+graded_results = OrderedDict()
+single_flight_lock = threading.Lock()
+
+# Opt-in speculative evaluation: the interview page posts the draft answer after the candidate stops
+# typing, it is graded in the background, and the final submit reuses that result when the normalized
+# answer text is unchanged. SPECULATION_MAX_PER_SESSION bounds the extra LLM calls per interview.
+SPECULATIVE_EVAL = os.getenv("SPECULATIVE_EVAL", "").lower() in ("1", "true", "yes")
+SPECULATION_MAX_PER_SESSION = int(os.getenv("SPECULATION_MAX_PER_SESSION", "10"))
+SPECULATION_CACHE_SIZE = 10000
+speculations = OrderedDict()
+speculation_executor = ThreadPoolExecutor(max_workers=EVAL_MAX_IN_FLIGHT, thread_name_prefix="speculate")
+
+# Circuit breaker around Gemini: after BREAKER_FAILURE_THRESHOLD consecutive failures calls fail fast to a
+# provisional local score for BREAKER_RESET_TIMEOUT seconds, then one trial call decides whether to close.
+# Provisional answers go to the persistent "regrade_queue" collection and are re-graded once it closes.
+# An item that fails REGRADE_MAX_ATTEMPTS times moves to "regrade_dead_letter" and keeps its provisional score.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+REGRADE_CHECK_INTERVAL = int(os.getenv("REGRADE_CHECK_INTERVAL", "60"))
+REGRADE_BATCH_SIZE = 20
+REGRADE_MAX_ATTEMPTS = int(os.getenv("REGRADE_MAX_ATTEMPTS", "5"))
+PROVISIONAL_MARKER = "Provisional: yes"
+STOPWORDS = {"the", "and", "for", "with", "that", "this", "from", "into", "are", "you", "use", "can", "then", "which", "its", "your"}
+breaker = {"state": "closed", "failures": 0, "opened_at": 0.0, "trial_in_flight": False}
+breaker_lock = threading.Lock()
+regrade_state = {"draining": False, "last_check": 0.0}
+regrade_lock = threading.Lock()
+
+# Request deadlines. Each request gets REQUEST_DEADLINE seconds from arrival, and every outbound call
+# (Gemini, Firestore, SMTP, the question sheet) gets the smaller of its own cap and what is left. No call is
+# made once the budget is spent. Either way the caller sees DeadlineExceeded and falls back as it does for
+# any other failure of that dependency, and deadline_exceeded_<dependency> is counted in /admin/metrics.
+# Background work and CLI commands only get the per-dependency caps.
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "30"))
+DEPENDENCY_TIMEOUTS = {
+    "gemini": float(os.getenv("GEMINI_TIMEOUT", "20")),
+    "firestore": float(os.getenv("FIRESTORE_TIMEOUT", "10")),
+    "smtp": float(os.getenv("SMTP_TIMEOUT", "10")),
+    "sheets": BANK_LOAD_TIMEOUT
+}
+GEMINI_BACKGROUND_RETRIES = 6
+DEADLINE_EXEMPT_ENDPOINTS = {"static", "export_interviews_endpoint"}  # streamed exports outlive any fixed budget
+DEADLINE_ERRORS = (TimeoutError, requests.exceptions.Timeout, google_exceptions.DeadlineExceeded, google_exceptions.RetryError)
+
+# Offline re-grading of stored interviews against the current rubric
+REGRADE_WORKERS = int(os.getenv("REGRADE_WORKERS", "4"))
+REGRADE_RATE = float(os.getenv("REGRADE_RATE", "2"))  # Gemini calls per second across all workers
+REGRADE_PAGE_SIZE = 50  # interviews evaluated together between checkpoints
+REGRADE_CACHE_SIZE = 5000
+
+# Process-wide counters and gauges, exported at /admin/metrics
+metrics = {}
+metrics_lock = threading.Lock()
+
+# Admin-only endpoints require the X-Admin-Token header to match ADMIN_TOKEN
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # Sanitize input to prevent injection
 def sanitize_input(text):
     if not isinstance(text, str):
@@ -106,24 +485,30 @@ def sanitize_input(text):
     text = re.sub(r'[<>;{}]', '', text)
     return text.strip()[:1000]  # Limit length to prevent abuse
 
+EMAIL_REGEX = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+# Random user_id candidate for a name (later attempts carry the counter in the suffix)
+def user_id_candidate(name, counter=1):
+    base = sanitize_input(name).replace(" ", "").lower()[:10]
+    if counter == 1:
+        random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+    else:
+        random_suffix = f"{counter:02d}{''.join(random.choices(string.ascii_lowercase + string.digits, k=4))}"
+    return f"{base}{random_suffix}"[:20]
+
 # Generate random user_id
 def generate_user_id(name):
-    name = sanitize_input(name)
-    base = name.replace(" ", "").lower()[:10]
     counter = 1
     while True:
-        if counter == 1:
-            random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
-        else:
-            random_suffix = f"{counter:02d}{''.join(random.choices(string.ascii_lowercase + string.digits, k=4))}"
-        user_id = f"{base}{random_suffix}"
-        if len(user_id) > 20:
-            user_id = user_id[:20]
+        user_id = user_id_candidate(name, counter)
         try:
-            if not db.collection("users").document(user_id).get().exists:
-                return user_id
+            with firestore_deadline() as options:
+                if not db.collection("users").document(user_id).get(**options).exists:
+                    return user_id
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            logger.error(f"Error checking user_id {user_id}: {str(e)}")
+            logger.error("Error checking user_id %s: %s", user_id, e)
             counter += 1
         if counter > 100:
             raise Exception("Failed to generate unique user_id")
@@ -144,207 +529,1464 @@ def send_summary_email(user_email, user_name, user_id, summary_data):
             current_year=datetime.datetime.now().year
         )
         msg.attach(MIMEText(html_body, "html"))
-        server = smtplib.SMTP("smtp.gmail.com", 587)
+        with dependency_deadline("smtp") as timeout:
+            server = smtplib.SMTP("smtp.gmail.com", 587, timeout=timeout)
         server.starttls()
         server.login(EMAIL_USER, EMAIL_PASS)
         server.sendmail(EMAIL_USER, user_email, msg.as_string())
         server.quit()
-        logger.info(f"Summary email sent to {user_email}")
+        logger.info("Summary email sent to %s", user_email)
     except Exception as e:
-        logger.error(f"Error sending email to {user_email}: {str(e)}")
+        logger.error("Error sending email to %s: %s", user_email, e)
 
-# Simplified LangChain-based evaluation function (no history to reduce size and API usage)
+# Simplified prompt without history for independent evaluation and reduced token usage
+EVALUATION_SYSTEM_PROMPT = """You are an expert Excel Mock Interviewer for finance, ops, and analytics roles. 
+        Evaluate responses objectively and provide constructive feedback. 
+        Always output exactly: Score: X/10\nFeedback: [1-2 sentences]"""
+EVALUATION_HUMAN_PROMPT = """
+        Current Time: {current_time} | Date: {current_date}
+        Question: {question}
+        Expected Answer (weight: key point, where weighted): {rubric}
+        User Answer: {user_answer}
+        Evaluate the user's answer for accuracy, completeness, and clarity.
+        Score from 0-{max_score} ({max_score}=perfect). Provide 1-2 sentence feedback.
+        """
+evaluation_prompt = ChatPromptTemplate.from_messages([
+    ("system", EVALUATION_SYSTEM_PROMPT),
+    ("human", EVALUATION_HUMAN_PROMPT)
+])
+PROMPT_VERSION = hashlib.sha1(f"{EVALUATION_SYSTEM_PROMPT}\0{EVALUATION_HUMAN_PROMPT}\0{MAX_SCORE}".encode("utf-8")).hexdigest()[:12]
+
+EVALUATOR_MODEL = "gemini-1.5-flash"
+EVALUATOR_TEMPERATURE = 0.3
+
+# Evaluator tiers. Answers go to the fast tier unless routing finds at least ROUTE_STRONG_MIN_SIGNALS of:
+# a long answer, a hard question (low mean score in question_stats) or an uncertain local pre-score.
+# Prices are USD per million tokens and only feed the per-tier cost report in /admin/metrics.
+EVALUATOR_TIERS = {
+    "fast": {
+        "model": EVALUATOR_MODEL,
+        "temperature": EVALUATOR_TEMPERATURE,
+        "input_price": float(os.getenv("FAST_EVALUATOR_INPUT_PRICE", "0.075")),
+        "output_price": float(os.getenv("FAST_EVALUATOR_OUTPUT_PRICE", "0.30"))
+    },
+    "strong": {
+        "model": os.getenv("STRONG_EVALUATOR_MODEL", "gemini-1.5-pro"),
+        "temperature": float(os.getenv("STRONG_EVALUATOR_TEMPERATURE", "0.2")),
+        "input_price": float(os.getenv("STRONG_EVALUATOR_INPUT_PRICE", "1.25")),
+        "output_price": float(os.getenv("STRONG_EVALUATOR_OUTPUT_PRICE", "5.00"))
+    }
+}
+EVALUATOR_ROUTING = os.getenv("EVALUATOR_ROUTING", "on").lower() != "off"
+ROUTE_SHORT_WORDS = int(os.getenv("ROUTE_SHORT_WORDS", "8"))  # shorter answers always use the fast tier
+ROUTE_LONG_WORDS = int(os.getenv("ROUTE_LONG_WORDS", "60"))
+ROUTE_HARD_QUESTION_MEAN = float(os.getenv("ROUTE_HARD_QUESTION_MEAN", "4.5"))
+ROUTE_UNCERTAIN_LOW = float(os.getenv("ROUTE_UNCERTAIN_LOW", "0.3"))  # pre-score share of MAX_SCORE
+ROUTE_UNCERTAIN_HIGH = float(os.getenv("ROUTE_UNCERTAIN_HIGH", "0.7"))
+ROUTE_STRONG_MIN_SIGNALS = int(os.getenv("ROUTE_STRONG_MIN_SIGNALS", "2"))
+
+# Evaluation cassette: one JSON line per Gemini call with its inputs, model parameters, raw response and
+# latency. Replay looks entries up through an in-memory key -> file offset index, so only the index (not the
+# responses) is held in memory. Entries are keyed on everything that determines the answer except the
+# clock fields, so replays match across days.
+EVAL_CASSETTE_PATH = os.getenv("EVAL_CASSETTE_PATH", os.path.join(BASE_DIR, "eval_cassette.jsonl"))
+EVAL_REPLAY_LATENCY = os.getenv("EVAL_REPLAY_LATENCY", "").lower() in ("1", "true", "yes")
+CASSETTE_KEY_PREFIX = b'{"key":"'
+
+class CassetteMiss(Exception):
+    pass
+
+def cassette_key(question, expected, user_answer, model=EVALUATOR_MODEL, temperature=EVALUATOR_TEMPERATURE, rubric=None):
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "prompt_version": PROMPT_VERSION,
+        "max_score": MAX_SCORE,
+        "question": question,
+        "expected": expected,
+        "user_answer": user_answer
+    }
+    # Answers graded against a compiled rubric are keyed apart from those graded against the raw expected answer
+    if rubric is not None and rubric != expected:
+        payload["rubric"] = rubric
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def tier_cassette_key(question, expected, user_answer, tier, rubric=None):
+    config = EVALUATOR_TIERS[tier]
+    if rubric is None:
+        rubric = rubric_for(expected)
+    return cassette_key(question, expected, user_answer, model=config["model"], temperature=config["temperature"], rubric=rubric)
+
+class EvaluationCassette:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.index = {}
+        self.file = None
+
+    # Scan the file once; the key sits at a fixed position at the start of each line so no JSON is parsed
+    def load_index(self):
+        started = time.monotonic()
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.startswith(CASSETTE_KEY_PREFIX):
+                    key = line[len(CASSETTE_KEY_PREFIX):len(CASSETTE_KEY_PREFIX) + 64].decode("ascii")
+                else:
+                    key = json.loads(line)["key"]
+                self.index.setdefault(key, (offset, len(line)))
+                offset += len(line)
+        self.file = open(self.path, "rb")
+        logger.info("Indexed %d cassette entries in %.2fs", len(self.index), time.monotonic() - started)
+
+    def lookup(self, key):
+        location = self.index.get(key)
+        if location is None:
+            return None
+        with self.lock:
+            self.file.seek(location[0])
+            line = self.file.read(location[1])
+        return json.loads(line)
+
+    def record(self, key, inputs, params, response, latency):
+        entry = {
+            "key": key,
+            "inputs": inputs,
+            "params": params,
+            "response": response,
+            "latency": round(latency, 4),
+            "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat()
+        }
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(line)
+            self.file.flush()
+
+cassette_init_lock = threading.Lock()
+
+def get_cassette():
+    with cassette_init_lock:
+        if not hasattr(get_cassette, "instance"):
+            cassette = EvaluationCassette(EVAL_CASSETTE_PATH)
+            if EVAL_CASSETTE_MODE == "replay":
+                cassette.load_index()
+            get_cassette.instance = cassette
+    return get_cassette.instance
+
+# Entries recorded under another tier still match, since routing inputs (question stats) drift between runs
+def replay_evaluation(question, expected, user_answer, tier="fast"):
+    cassette = get_cassette()
+    entry = None
+    for name in [tier] + [other for other in EVALUATOR_TIERS if other != tier]:
+        entry = cassette.lookup(tier_cassette_key(question, expected, user_answer, name))
+        if entry is not None:
+            break
+    if entry is None:
+        incr_metric("cassette_misses")
+        raise CassetteMiss("No recorded evaluation for this answer")
+    incr_metric("cassette_hits")
+    if EVAL_REPLAY_LATENCY:
+        time.sleep(entry.get("latency", 0))
+    return entry["response"]
+
+# Host-wide cache shared by every worker process: a SQLite database in WAL mode, so readers never block on
+# a writer and reads go through a memory-mapped view of the file (PRAGMA mmap_size). It holds Gemini
+# evaluations keyed like cassette entries (model, prompt version, question and answer), so an answer graded
+# by one worker is a hit in all others, and loaded question banks, so only one worker per host fetches the
+# sheet. Every worker publishes its hit counts and resident memory for /admin/metrics.
+# Set SHARED_CACHE_PATH to an empty string to disable.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(BASE_DIR, "shared_cache.sqlite3"))
+SHARED_CACHE_MAX_EVALUATIONS = int(os.getenv("SHARED_CACHE_MAX_EVALUATIONS", "100000"))
+SHARED_CACHE_MMAP_BYTES = int(os.getenv("SHARED_CACHE_MMAP_BYTES", str(64 * 1024 * 1024)))
+SHARED_BANK_TTL = int(os.getenv("SHARED_BANK_TTL", "600"))  # seconds a bank loaded by another worker is reused
+SHARED_CACHE_TRIM_EVERY = 500  # writes between trims of the evaluation table
+SHARED_CACHE_STATS_INTERVAL = 10  # seconds between per-worker stats updates
+SHARED_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluations (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS banks (name TEXT PRIMARY KEY, bank TEXT NOT NULL, loaded_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS workers (pid INTEGER PRIMARY KEY, stats TEXT NOT NULL, updated REAL NOT NULL);
+"""
+
+# Current resident set size; falls back to the peak where /proc is unavailable
+def resident_memory_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class SharedCache:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {"evaluation_hits": 0, "evaluation_misses": 0, "bank_hits": 0, "bank_misses": 0, "errors": 0}
+        self.writes = 0
+        self.stats_published = 0
+
+    # One connection per thread and process; gunicorn forks after import, so connections are never inherited
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={SHARED_CACHE_MMAP_BYTES}")
+            conn.executescript(SHARED_CACHE_SCHEMA)
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def get_evaluation(self, key):
+        try:
+            row = self.connection().execute("SELECT response FROM evaluations WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.error("Error reading shared evaluation cache: %s", e)
+            self.count("errors")
+            return None
+        self.count("evaluation_hits" if row else "evaluation_misses")
+        self.publish_stats()
+        return row[0] if row else None
+
+    def put_evaluation(self, key, response):
+        try:
+            conn = self.connection()
+            conn.execute("INSERT OR REPLACE INTO evaluations (key, response, created) VALUES (?, ?, ?)", (key, response, time.time()))
+            with self.lock:
+                self.writes += 1
+                trim = self.writes % SHARED_CACHE_TRIM_EVERY == 0
+            if trim:
+                # Oldest entries go first; rowids grow with every insert
+                conn.execute(
+                    "DELETE FROM evaluations WHERE rowid <= (SELECT MAX(rowid) FROM evaluations) - ?",
+                    (SHARED_CACHE_MAX_EVALUATIONS,)
+                )
+        except sqlite3.Error as e:
+            logger.error("Error writing shared evaluation cache: %s", e)
+            self.count("errors")
+
+    def get_bank(self, name):
+        try:
+            row = self.connection().execute(
+                "SELECT bank FROM banks WHERE name = ? AND loaded_at > ?", (name, time.time() - SHARED_BANK_TTL)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error("Error reading shared bank cache: %s", e)
+            self.count("errors")
+            return None
+        self.count("bank_hits" if row else "bank_misses")
+        return json.loads(row[0]) if row else None
+
+    def put_bank(self, bank):
+        try:
+            self.connection().execute(
+                "INSERT OR REPLACE INTO banks (name, bank, loaded_at) VALUES (?, ?, ?)",
+                (bank["name"], json.dumps(bank), bank["loaded_at"])
+            )
+        except sqlite3.Error as e:
+            logger.error("Error writing shared bank cache: %s", e)
+            self.count("errors")
+
+    def worker_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["evaluation_hits"] + stats["evaluation_misses"]
+        stats["evaluation_hit_rate"] = stats["evaluation_hits"] / lookups if lookups else 0
+        stats["resident_bytes"] = resident_memory_bytes()
+        return stats
+
+    def publish_stats(self, force=False):
+        now = time.time()
+        with self.lock:
+            if not force and now - self.stats_published < SHARED_CACHE_STATS_INTERVAL:
+                return
+            self.stats_published = now
+        try:
+            self.connection().execute(
+                "INSERT OR REPLACE INTO workers (pid, stats, updated) VALUES (?, ?, ?)",
+                (os.getpid(), json.dumps(self.worker_stats()), now)
+            )
+        except sqlite3.Error as e:
+            logger.error("Error publishing shared cache stats: %s", e)
+
+    # Stats of every worker that reported recently, plus totals across them
+    def report(self):
+        self.publish_stats(force=True)
+        conn = self.connection()
+        rows = conn.execute(
+            "SELECT pid, stats FROM workers WHERE updated > ?", (time.time() - 6 * SHARED_CACHE_STATS_INTERVAL,)
+        ).fetchall()
+        workers = {str(pid): json.loads(stats) for pid, stats in rows}
+        hits = sum(w["evaluation_hits"] for w in workers.values())
+        lookups = hits + sum(w["evaluation_misses"] for w in workers.values())
+        return {
+            "workers": workers,
+            "evaluation_hit_rate": hits / lookups if lookups else 0,
+            "evaluations_cached": conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0],
+            "file_bytes": sum(os.path.getsize(self.path + suffix) for suffix in ("", "-wal") if os.path.exists(self.path + suffix)),
+            "resident_bytes_total": sum(w["resident_bytes"] for w in workers.values())
+        }
+
+shared_cache_init_lock = threading.Lock()
+
+# The shared cache, or None when disabled
+def get_shared_cache():
+    if not SHARED_CACHE_PATH:
+        return None
+    with shared_cache_init_lock:
+        if not hasattr(get_shared_cache, "instance"):
+            get_shared_cache.instance = SharedCache(SHARED_CACHE_PATH)
+    return get_shared_cache.instance
+
+class DeadlineExceeded(Exception):
+    def __init__(self, dependency, exhausted):
+        super().__init__(f"{dependency} deadline exceeded" + (" before the call" if exhausted else ""))
+        self.dependency = dependency
+        self.exhausted = exhausted  # no call was made because the request budget was already spent
+
+# Work started on behalf of a request in another thread (speculative evaluations) carries its deadline here
+thread_deadline = threading.local()
+
+def request_deadline():
+    if has_request_context():
+        return g.get("deadline")
+    return getattr(thread_deadline, "deadline", None)
+
+# How long a request may wait on work running in another thread: SINGLE_FLIGHT_WAIT, cut to what is left
+# of its budget. The second value is True when the budget, not SINGLE_FLIGHT_WAIT, is the limit.
+def wait_budget():
+    deadline = request_deadline()
+    if deadline is None:
+        return SINGLE_FLIGHT_WAIT, False
+    remaining = max(0.0, deadline - time.monotonic())
+    return min(SINGLE_FLIGHT_WAIT, remaining), remaining < SINGLE_FLIGHT_WAIT
+
+# Timeout for one call to a dependency; raises DeadlineExceeded when the request has no time left
+def dependency_timeout(dependency):
+    timeout = DEPENDENCY_TIMEOUTS[dependency]
+    deadline = request_deadline()
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        incr_metric(f"deadline_exceeded_{dependency}")
+        raise DeadlineExceeded(dependency, exhausted=True)
+    return min(timeout, remaining)
+
+# Wrap one dependency call: yields its timeout and turns the client's timeout errors into DeadlineExceeded
+@contextmanager
+def dependency_deadline(dependency):
+    timeout = dependency_timeout(dependency)
+    try:
+        yield timeout
+    except DEADLINE_ERRORS as e:
+        incr_metric(f"deadline_exceeded_{dependency}")
+        raise DeadlineExceeded(dependency, exhausted=False) from e
+
+# Firestore calls take a per-attempt timeout plus a retry policy; both are bounded by the remaining budget
+@contextmanager
+def firestore_deadline():
+    with dependency_deadline("firestore") as timeout:
+        yield {"timeout": timeout, "retry": Retry(timeout=timeout)}
+
+# Simplified LangChain-based evaluation call (no history to reduce size and API usage); raises on API errors.
+# Without an explicit tier the answer is routed first.
+def call_evaluator(question, expected, user_answer, tier=None):
+    if tier is None:
+        tier = route_evaluation(question, expected, user_answer)
+    if EVAL_CASSETTE_MODE == "replay":
+        return replay_evaluation(question, expected, user_answer, tier)
+    # Counted here rather than in route_evaluation(), so cache hits and breaker fast-fails are left out
+    incr_metric(f"evaluations_routed_{tier}")
+
+    current_time = datetime.datetime.now().strftime("%H:%M")
+    current_date = datetime.datetime.now().strftime("%d %B %Y, %A")
+    rubric = rubric_for(expected)
+    incr_metric("evaluations_with_rubric" if rubric != expected else "evaluations_without_rubric")
+    inputs = {
+        "question": question,
+        "expected": expected,
+        "rubric": rubric,
+        "user_answer": user_answer,
+        "current_time": current_time,
+        "current_date": current_date,
+        "max_score": MAX_SCORE
+    }
+
+    config = EVALUATOR_TIERS[tier]
+    llm = ChatGoogleGenerativeAI(
+        model=config["model"],
+        google_api_key=GEMINI_API_KEY,
+        temperature=config["temperature"]
+    )
+    with dependency_deadline("gemini") as timeout:
+        # A request has no time for the client's backoff retries; the provisional score and re-grade queue
+        # cover a failed call instead
+        retries = 1 if request_deadline() is not None else GEMINI_BACKGROUND_RETRIES
+        chain = evaluation_prompt | llm.bind(timeout=timeout, max_retries=retries)
+        started = time.monotonic()
+        response = chain.invoke(inputs)
+    latency = time.monotonic() - started
+    content = response.content.strip()
+    record_tier_call(tier, latency, getattr(response, "usage_metadata", None), inputs, content)
+    if EVAL_CASSETTE_MODE == "record":
+        params = {"model": config["model"], "temperature": config["temperature"], "prompt_version": PROMPT_VERSION, "tier": tier}
+        get_cassette().record(tier_cassette_key(question, expected, user_answer, tier, rubric), inputs, params, content, latency)
+    return content
+
+# Per-tier call count, latency, tokens and cost. Token counts come from the response's usage metadata,
+# or are estimated at 4 characters per token when the client does not report them.
+def record_tier_call(tier, latency, usage, inputs, content):
+    usage = usage or {}
+    input_tokens = usage.get("input_tokens") or (len(EVALUATION_SYSTEM_PROMPT) + len(EVALUATION_HUMAN_PROMPT.format(**inputs))) // 4
+    output_tokens = usage.get("output_tokens") or len(content) // 4
+    config = EVALUATOR_TIERS[tier]
+    with metrics_lock:
+        tier_metrics = metrics.setdefault("evaluator_tiers", {}).setdefault(
+            tier, {"calls": 0, "seconds_total": 0.0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+        )
+        tier_metrics["calls"] += 1
+        tier_metrics["seconds_total"] += latency
+        tier_metrics["input_tokens"] += input_tokens
+        tier_metrics["output_tokens"] += output_tokens
+        tier_metrics["cost_usd"] += (input_tokens * config["input_price"] + output_tokens * config["output_price"]) / 1e6
+
+# Compact grading rubrics. Each expected answer is compiled once by the fast tier into a few weighted key
+# points ("4: exact-match VLOOKUP; 3: absolute references; ...") that the evaluation prompt carries instead
+# of the full expected answer. Rubrics live in the "rubrics" collection keyed by a hash of the expected
+# answer and the compiler prompt, so they are only recompiled when `exp` (or the prompt) changes. They are
+# also saved on the bank's question_bank_versions document. Until a rubric is available, or when it would not
+# be shorter, the expected answer is sent as before.
+RUBRIC_SYSTEM_PROMPT = """You turn model answers to Excel interview questions into compact grading rubrics.
+        Output only the rubric lines, one key point per line as: weight|point"""
+RUBRIC_HUMAN_PROMPT = """
+        Question: {question}
+        Model Answer: {expected}
+        List at most {max_points} key points a correct answer must contain, each under 12 words.
+        Weights are whole numbers summing to {max_score}.
+        """
+RUBRIC_MAX_POINTS = 5
+RUBRIC_CACHE_SIZE = 5000
+RUBRIC_COMPILE_ATTEMPTS = 2
+RUBRIC_RELOAD_INTERVAL = 60
+RUBRIC_RELOAD_ATTEMPTS = 10
+RUBRIC_VERSION = hashlib.sha1(
+    f"{RUBRIC_SYSTEM_PROMPT}\0{RUBRIC_HUMAN_PROMPT}\0{RUBRIC_MAX_POINTS}\0{MAX_SCORE}".encode("utf-8")
+).hexdigest()[:12]
+rubric_prompt = ChatPromptTemplate.from_messages([
+    ("system", RUBRIC_SYSTEM_PROMPT),
+    ("human", RUBRIC_HUMAN_PROMPT)
+])
+compiled_rubrics = OrderedDict()  # rubric_key -> compact rubric text
+rubrics_lock = threading.Lock()
+rubric_compile_lock = threading.Lock()  # one compilation at a time, so a later one reuses what the first stored
+rubric_jobs = set()  # (bank, version) pairs this process has already started loading or compiling
+
+def rubric_key(expected):
+    return hashlib.sha1(f"{RUBRIC_VERSION}\0{expected}".encode("utf-8")).hexdigest()[:20]
+
+# "weight|point" lines (optionally numbered or bulleted) into "weight: point; weight: point". Raises
+# ValueError unless there are 1..RUBRIC_MAX_POINTS points whose weights sum to MAX_SCORE.
+def parse_rubric(text):
+    points = []
+    weights = 0
+    for line in text.splitlines():
+        match = re.match(r"^\W*(?:\d+[.)]\s*)?(\d+)\s*\|\s*(.+?)\s*$", line)
+        if match:
+            weights += int(match.group(1))
+            points.append(f"{int(match.group(1))}: {match.group(2)}")
+    if not points:
+        raise ValueError("No rubric points in compiler output")
+    if len(points) > RUBRIC_MAX_POINTS or weights != MAX_SCORE:
+        raise ValueError(f"Rubric has {len(points)} points weighing {weights}; expected at most {RUBRIC_MAX_POINTS} weighing {MAX_SCORE}")
+    return "; ".join(points)
+
+# Compile one rubric, asking again when the output does not parse to a full-weight rubric
+def compile_rubric(question, expected):
+    config = EVALUATOR_TIERS["fast"]
+    llm = ChatGoogleGenerativeAI(model=config["model"], google_api_key=GEMINI_API_KEY, temperature=0)
+    for attempt in range(RUBRIC_COMPILE_ATTEMPTS):
+        with dependency_deadline("gemini") as timeout:
+            response = (rubric_prompt | llm.bind(timeout=timeout)).invoke({
+                "question": question,
+                "expected": expected,
+                "max_points": RUBRIC_MAX_POINTS,
+                "max_score": MAX_SCORE
+            })
+        try:
+            return parse_rubric(response.content)
+        except ValueError as e:
+            if attempt + 1 == RUBRIC_COMPILE_ATTEMPTS:
+                raise
+            logger.warning("Recompiling rubric for question %s: %s", question_key(question), e)
+
+def remember_rubrics(rubrics):
+    with rubrics_lock:
+        for key, rubric in rubrics.items():
+            compiled_rubrics[key] = rubric
+            compiled_rubrics.move_to_end(key)
+        while len(compiled_rubrics) > RUBRIC_CACHE_SIZE:
+            compiled_rubrics.popitem(last=False)
+
+# Rubric text for a (sanitized) expected answer, or the expected answer itself when none is compiled yet
+def rubric_for(expected):
+    with rubrics_lock:
+        return compiled_rubrics.get(rubric_key(expected), expected)
+
+def bank_expected_answers(bank):
+    expected_by_key = {}
+    for q in bank["questions"]:
+        expected = sanitize_input(q["exp"])
+        expected_by_key[rubric_key(expected)] = (sanitize_input(q["q"]), expected)
+    return expected_by_key
+
+def load_stored_rubrics(expected_by_key):
+    rubrics = {}
+    with firestore_deadline() as options:
+        snapshots = db.get_all([db.collection("rubrics").document(key) for key in expected_by_key], **options)
+    for snapshot in snapshots:
+        if snapshot.exists:
+            rubrics[snapshot.id] = snapshot.to_dict()["rubric"]
+    remember_rubrics(rubrics)
+    return rubrics
+
+# Load the bank's stored rubrics and compile the missing ones. Returns counts and the estimated prompt
+# tokens (4 characters per token) of the expected answers against the rubrics that replace them.
+def compile_rubrics(bank):
+    with rubric_compile_lock:
+        return compile_bank_rubrics(bank)
+
+def compile_bank_rubrics(bank):
+    expected_by_key = bank_expected_answers(bank)
+    rubrics = load_stored_rubrics(expected_by_key)
+    stats = {"questions": len(expected_by_key), "reused": len(rubrics), "compiled": 0, "failed": 0}
+    # Replay runs have no Gemini access; they use whatever was compiled before
+    if EVAL_CASSETTE_MODE != "replay":
+        for key, (question, expected) in expected_by_key.items():
+            if key in rubrics:
+                continue
+            try:
+                rubric = compile_rubric(question, expected)
+            except Exception as e:
+                logger.error("Error compiling rubric for question %s: %s", question_key(question), e)
+                stats["failed"] += 1
+                continue
+            # Stored even when it is not shorter, so the answer is not compiled again
+            rubrics[key] = rubric if len(rubric) < len(expected) else expected
+            with firestore_deadline() as options:
+                db.collection("rubrics").document(key).set({
+                    "rubric": rubrics[key],
+                    "version": RUBRIC_VERSION,
+                    "created_at": firestore.SERVER_TIMESTAMP
+                }, **options)
+            stats["compiled"] += 1
+    remember_rubrics(rubrics)
+    with firestore_deadline() as options:
+        db.collection("question_bank_versions").document(f"{bank['name']}_{bank['version']}").set({"rubrics": rubrics}, merge=True, **options)
+    stats["expected_tokens_avg"] = sum(len(expected) for _, expected in expected_by_key.values()) / 4 / max(1, len(expected_by_key))
+    stats["prompt_tokens_avg"] = sum(len(rubrics.get(key, expected)) for key, (_, expected) in expected_by_key.items()) / 4 / max(1, len(expected_by_key))
+    return stats
+
+# Only one worker across all hosts compiles a bank version: it holds a rubric_jobs/{bank}_{version} lease,
+# created with create() so the others see AlreadyExists. The lease is kept once everything compiled and
+# dropped after failures so a later load retries. Other workers load the stored rubrics and reload them
+# every RUBRIC_RELOAD_INTERVAL seconds until the bank is complete. `compile-rubrics` ignores the lease.
+def claim_rubric_job(bank):
+    try:
+        with firestore_deadline() as options:
+            db.collection("rubric_jobs").document(f"{bank['name']}_{bank['version']}").create({
+                "pid": os.getpid(),
+                "started_at": firestore.SERVER_TIMESTAMP
+            }, **options)
+        return True
+    except google_exceptions.AlreadyExists:
+        return False
+
+def start_rubric_job(bank):
+    job = (bank["name"], bank["version"])
+    with rubrics_lock:
+        if job in rubric_jobs:
+            return
+        rubric_jobs.add(job)
+    background_executor.submit(compile_rubrics_task, bank)
+
+def compile_rubrics_task(bank, attempt=0):
+    try:
+        if attempt == 0 and claim_rubric_job(bank):
+            stats = compile_rubrics(bank)
+            logger.info("Rubrics for bank %s: %s", bank["name"], stats)
+            if stats["failed"]:
+                db.collection("rubric_jobs").document(f"{bank['name']}_{bank['version']}").delete()
+                with rubrics_lock:
+                    rubric_jobs.discard((bank["name"], bank["version"]))
+            return
+        expected_by_key = bank_expected_answers(bank)
+        missing = len(expected_by_key) - len(load_stored_rubrics(expected_by_key))
+    except Exception as e:
+        logger.error("Error compiling rubrics for bank %s: %s", bank["name"], e)
+        missing = None
+    if missing and attempt + 1 < RUBRIC_RELOAD_ATTEMPTS:
+        # Another worker is compiling; pick up its rubrics once they are stored
+        timer = threading.Timer(RUBRIC_RELOAD_INTERVAL, lambda: background_executor.submit(compile_rubrics_task, bank, attempt + 1))
+        timer.daemon = True
+        timer.start()
+    elif missing is None:
+        with rubrics_lock:
+            rubric_jobs.discard((bank["name"], bank["version"]))
+
+# Local fallback score: share of the expected answer's keywords that appear in the user's answer
+def provisional_score(expected, user_answer):
+    expected_terms = {word for word in re.findall(r"[a-z0-9]+", expected.lower()) if len(word) > 2 and word not in STOPWORDS}
+    if not expected_terms:
+        return 0
+    answer_terms = set(re.findall(r"[a-z0-9]+", user_answer.lower()))
+    return round(MAX_SCORE * len(expected_terms & answer_terms) / len(expected_terms))
+
+def provisional_evaluation(expected, user_answer):
+    incr_metric("provisional_evaluations")
+    return (
+        f"{PROVISIONAL_MARKER}\nScore: {provisional_score(expected, user_answer)}/{MAX_SCORE}\n"
+        f"Feedback: Provisional score while the AI evaluator is unavailable; this answer will be re-graded automatically."
+    )
+
+# Pick the evaluator tier for an answer from cheap local features. Short answers are always "fast";
+# otherwise each of a long answer, a hard question and a pre-score in the uncertain middle band is a
+# signal, and ROUTE_STRONG_MIN_SIGNALS of them send the answer to the strong tier.
+def route_evaluation(question, expected, user_answer):
+    words = len(user_answer.split())
+    if not EVALUATOR_ROUTING or words < ROUTE_SHORT_WORDS:
+        tier = "fast"
+    else:
+        pre_score = provisional_score(expected, user_answer) / MAX_SCORE
+        question_mean = question_difficulty(question, get_question_difficulties())[0]
+        signals = sum([
+            words >= ROUTE_LONG_WORDS,
+            question_mean < ROUTE_HARD_QUESTION_MEAN,
+            ROUTE_UNCERTAIN_LOW <= pre_score <= ROUTE_UNCERTAIN_HIGH
+        ])
+        tier = "strong" if signals >= ROUTE_STRONG_MIN_SIGNALS else "fast"
+    return tier
+
+# Evaluate an answer with Gemini; when it fails or the circuit breaker is open, return a provisional
+# local score (marked with PROVISIONAL_MARKER) instead of waiting on the API
 def evaluate_answer(question, expected, user_answer):
     question = sanitize_input(question)
     expected = sanitize_input(expected)
     user_answer = sanitize_input(user_answer)
     
-    if not GEMINI_API_KEY:
+    if not GEMINI_API_KEY and EVAL_CASSETTE_MODE != "replay":
         logger.error("No valid Gemini API key available")
         return f"Score: 0/{MAX_SCORE}\nFeedback: API configuration error"
     
     if not user_answer:
         return f"Score: 0/{MAX_SCORE}\nFeedback: Empty answer"
 
-    # Simplified prompt without history for independent evaluation and reduced token usage
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", """You are an expert Excel Mock Interviewer for finance, ops, and analytics roles. 
-        Evaluate responses objectively and provide constructive feedback. 
-        Always output exactly: Score: X/10\nFeedback: [1-2 sentences]"""),
-        ("human", """
-        Current Time: {current_time} | Date: {current_date}
-        Question: {question}
-        Expected Answer: {expected}
-        User Answer: {user_answer}
-        Evaluate the user's answer for accuracy, completeness, and clarity.
-        Score from 0-{max_score} ({max_score}=perfect). Provide 1-2 sentence feedback.
-        """)
-    ])
+    tier = route_evaluation(question, expected, user_answer)
+    # Cassette runs see every call, so only plain runs go through the shared cache
+    shared = get_shared_cache() if EVAL_CASSETTE_MODE == "off" else None
+    if shared is not None:
+        key = tier_cassette_key(question, expected, user_answer, tier)
+        cached = shared.get_evaluation(key)
+        if cached is not None:
+            return cached
 
-    current_time = datetime.datetime.now().strftime("%H:%M")
-    current_date = datetime.datetime.now().strftime("%d %B %Y, %A")
+    allowed = breaker_allows_call()
+    if not allowed:
+        incr_metric("breaker_fast_failures")
+        return provisional_evaluation(expected, user_answer)
 
     try:
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=GEMINI_API_KEY,
-            temperature=0.3
-        )
-        chain = prompt_template | llm
-        response = chain.invoke({
-            "question": question,
-            "expected": expected,
-            "user_answer": user_answer,
-            "current_time": current_time,
-            "current_date": current_date,
-            "max_score": MAX_SCORE
-        })
-        model_response = response.content.strip()
-        logger.info(f"Evaluation completed for question using Gemini API")
+        model_response = call_evaluator(question, expected, user_answer, tier)
+        record_breaker_success()
+        logger.info("Evaluation completed for question using Gemini API", extra={"sampled": True})
+        if shared is not None:
+            shared.put_evaluation(key, model_response)
         return model_response
+    except CassetteMiss as e:
+        # A gap in the recording says nothing about Gemini's health, so the breaker is left alone
+        logger.warning("Replay failed: %s", e)
+        if allowed == "trial":
+            release_breaker_trial()
+        return provisional_evaluation(expected, user_answer)
+    except DeadlineExceeded as e:
+        logger.warning("Evaluation skipped: %s", e)
+        # Only a call that actually timed out counts against Gemini
+        if not e.exhausted:
+            record_breaker_failure()
+        elif allowed == "trial":
+            release_breaker_trial()
+        return provisional_evaluation(expected, user_answer)
     except Exception as e:
-        logger.error(f"Error with Gemini API: {str(e)}")
-        return f"Score: 0/{MAX_SCORE}\nFeedback: Evaluation failed due to API error"
+        logger.error("Error with Gemini API: %s", e)
+        record_breaker_failure()
+        return provisional_evaluation(expected, user_answer)
+
+# Split a "Score: X/10\nFeedback: ..." response into (score, feedback); raises on malformed responses
+def parse_evaluation(eval_result):
+    score_str = eval_result.split("Score: ")[1].split(f"/{MAX_SCORE}")[0].strip()
+    score = int(float(score_str))
+    feedback = eval_result.split("Feedback: ")[1].strip()
+    return score, feedback
 
 # Validate session ID
 def validate_session_id(session_id):
     try:
-        doc = db.collection("sessions").document(session_id).get()
+        with firestore_deadline() as options:
+            doc = db.collection("sessions").document(session_id).get(**options)
         if not doc.exists:
-            logger.warning(f"Session {session_id} does not exist")
+            logger.warning("Session %s does not exist", session_id)
             return False
+        g.session_doc = doc.to_dict()  # reused for stored evaluation results
         return True
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error("Error validating session ID %s: %s", session_id, e)
+        return False
+
+# Pick the best encoding the client accepts (brotli only if installed)
+def negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+# Render a template once per cache key and serve it with a strong ETag (304 when unchanged)
+def render_cached(cache_key, template_name, **context):
+    with render_cache_lock:
+        entry = render_cache.get(cache_key)
+        if entry is not None:
+            render_cache.move_to_end(cache_key)
+    if entry is None:
+        body = render_template(template_name, **context).encode("utf-8")
+        entry = {"etag": hashlib.sha256(body).hexdigest()[:32], "identity": body}
+        with render_cache_lock:
+            render_cache[cache_key] = entry
+            while len(render_cache) > RENDER_CACHE_SIZE:
+                render_cache.popitem(last=False)
+
+    encoding = negotiate_encoding()
+    if encoding and len(entry["identity"]) >= COMPRESS_MIN_SIZE:
+        body = entry.get(encoding)
+        if body is None:
+            body = compress_body(entry["identity"], encoding)
+            entry[encoding] = body
+        etag = f"{entry['etag']}-{encoding}"
+    else:
+        encoding = None
+        body = entry["identity"]
+        etag = entry["etag"]
+
+    response = make_response(body)
+    response.mimetype = "text/html"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+# Versioned static URL so split-out assets can be cached for a year
+@app.template_global()
+def asset_url(filename):
+    version = asset_versions.get(filename)
+    if version is None:
+        try:
+            with open(os.path.join(app.static_folder, filename), "rb") as f:
+                version = hashlib.sha256(f.read()).hexdigest()[:12]
+        except OSError as e:
+            logger.error("Error reading static asset %s: %s", filename, e)
+            version = "0"
+        asset_versions[filename] = version
+    return url_for("static", filename=filename, v=version)
+
+# Long-lived cache headers for versioned assets, compression for other HTML responses
+@app.after_request
+def optimize_response(response):
+    if request.path.startswith(app.static_url_path + "/"):
+        if request.args.get("v") and response.status_code in (200, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+    if (response.mimetype == "text/html" and response.status_code == 200
+            and not response.direct_passthrough and "Content-Encoding" not in response.headers):
+        encoding = negotiate_encoding()
+        body = response.get_data()
+        if encoding and len(body) >= COMPRESS_MIN_SIZE:
+            response.set_data(compress_body(body, encoding))
+            response.headers["Content-Encoding"] = encoding
+            response.vary.add("Accept-Encoding")
+    return response
+
+def incr_metric(name, value=1):
+    with metrics_lock:
+        metrics[name] = metrics.get(name, 0) + value
+
+def max_metric(name, value):
+    with metrics_lock:
+        metrics[name] = max(metrics.get(name, 0), value)
+
+class EvaluationRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+# Take one token from each (key, rate, burst) bucket, or from none of them when any is empty, so a request
+# refused by one bucket does not drain the others. Returns 0 on success or the seconds until all have a token.
+def take_tokens(buckets):
+    now = time.monotonic()
+    with rate_limit_lock:
+        levels = []
+        wait = 0
+        for key, rate, burst in buckets:
+            tokens, updated = rate_buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            levels.append((key, tokens))
+            if tokens < 1:
+                wait = max(wait, math.ceil((1 - tokens) / rate))
+        for key, tokens in levels:
+            rate_buckets[key] = (tokens - 1 if not wait else tokens, now)
+        while len(rate_buckets) > RATE_LIMIT_MAX_KEYS:
+            rate_buckets.popitem(last=False)
+    return wait
+
+# Take one token from the bucket; returns 0 on success or the seconds until a token is available
+def take_token(key, rate, burst):
+    return take_tokens([(key, rate, burst)])
+
+# Hold an evaluation slot for the duration of the block, or raise EvaluationRejected
+@contextmanager
+def admit_evaluation(session_id, client_ip):
+    wait = take_tokens([(f"ip:{client_ip}", IP_RATE, IP_BURST), (f"session:{session_id}", SESSION_RATE, SESSION_BURST)])
+    if wait:
+        incr_metric("evaluations_rejected_rate_limited")
+        raise EvaluationRejected("rate_limited", wait)
+
+    started = time.monotonic()
+    if not eval_slots.acquire(blocking=False):
+        with metrics_lock:
+            if metrics.get("evaluations_waiting", 0) >= EVAL_MAX_QUEUE:
+                metrics["evaluations_rejected_queue_full"] = metrics.get("evaluations_rejected_queue_full", 0) + 1
+                raise EvaluationRejected("queue_full", EVAL_RETRY_AFTER)
+            metrics["evaluations_waiting"] = metrics.get("evaluations_waiting", 0) + 1
+        try:
+            acquired = eval_slots.acquire(timeout=EVAL_QUEUE_TIMEOUT)
+        finally:
+            incr_metric("evaluations_waiting", -1)
+        if not acquired:
+            incr_metric("evaluations_rejected_timeout")
+            raise EvaluationRejected("queue_timeout", EVAL_RETRY_AFTER)
+
+    waited = time.monotonic() - started
+    incr_metric("evaluations_admitted")
+    incr_metric("evaluation_queue_wait_seconds_total", waited)
+    max_metric("evaluation_queue_wait_seconds_max", waited)
+    incr_metric("evaluations_in_flight")
+    try:
+        yield
+    finally:
+        incr_metric("evaluations_in_flight", -1)
+        eval_slots.release()
+
+def stored_evaluation(session_id, attempt, step):
+    with single_flight_lock:
+        result = graded_results.get((session_id, attempt, step))
+    if result is None:
+        graded = (getattr(g, "session_doc", None) or {}).get("graded", {})
+        result = graded.get(f"{attempt}_{step}", {}).get("result")
+    return result
+
+def stored_feedback(session_id, attempt, step):
+    result = stored_evaluation(session_id, attempt, step)
+    if result is None:
+        return "Feedback unavailable"
+    try:
+        return parse_evaluation(result)[1]
+    except Exception:
+        return "Evaluation failed"
+
+def store_evaluation(session_id, attempt, step, result, answer):
+    with single_flight_lock:
+        graded_results[(session_id, attempt, step)] = result
+        while len(graded_results) > GRADED_CACHE_SIZE:
+            graded_results.popitem(last=False)
+    try:
+        with firestore_deadline() as options:
+            db.collection("sessions").document(session_id).update({f"graded.{attempt}_{step}": {"result": result, "answer": answer}}, **options)
     except Exception as e:
-        logger.error(f"Error validating session ID {session_id}: {str(e)}")
+        logger.error("Error storing evaluation for session %s step %d: %s", session_id, step, e)
+
+# Evaluate the answer for (session_id, attempt, step) at most once; duplicates get the same raw result
+def evaluate_once(session_id, attempt, step, q_data, user_input, client_ip):
+    result = stored_evaluation(session_id, attempt, step)
+    if result is not None:
+        incr_metric("duplicate_evaluations_avoided")
+        logger.info("Returning stored evaluation for session %s step %s", session_id, step, extra={"sampled": True})
+        return result
+
+    key = (session_id, attempt, step)
+    with single_flight_lock:
+        flight = inflight_evaluations.get(key)
+        leader = flight is None
+        if leader:
+            flight = {"done": threading.Event(), "result": None, "error": None}
+            inflight_evaluations[key] = flight
+
+    if not leader:
+        incr_metric("duplicate_evaluations_avoided")
+        logger.info("Waiting on in-flight evaluation for session %s step %s", session_id, step, extra={"sampled": True})
+        timeout, budget_limited = wait_budget()
+        if not flight["done"].wait(timeout=timeout):
+            if budget_limited:
+                incr_metric("deadline_exceeded_single_flight")
+                return provisional_evaluation(q_data["exp"], user_input)
+            raise EvaluationRejected("duplicate_timeout", EVAL_RETRY_AFTER)
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["result"]
+
+    try:
+        result = speculative_result(session_id, attempt, step, q_data, user_input)
+        if result is None:
+            started = time.monotonic()
+            with admit_evaluation(session_id, client_ip):
+                result = evaluate_answer(q_data["q"], q_data["exp"], user_input)
+            incr_metric("evaluations_completed")
+            incr_metric("evaluation_seconds_total", time.monotonic() - started)
+        flight["result"] = result
+        store_evaluation(session_id, attempt, step, result, user_input)
+        return result
+    except Exception as e:
+        flight["error"] = e
+        raise
+    finally:
+        with single_flight_lock:
+            inflight_evaluations.pop(key, None)
+        flight["done"].set()
+
+# Whitespace/case-insensitive hash of an answer, used to match drafts with final submissions
+def answer_hash(text):
+    normalized = " ".join(sanitize_input(text).lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+# Grade a draft in the background, only if an evaluation slot is free right now
+# Runs under the deadline of the draft request that started it, so Gemini gets the request-path timeout
+# and no backoff retries while this holds an evaluation slot
+def run_speculation(question, expected, answer, deadline):
+    if not eval_slots.acquire(blocking=False):
+        incr_metric("speculations_skipped_busy")
+        return None
+    thread_deadline.deadline = deadline
+    try:
+        incr_metric("evaluations_in_flight")
+        return evaluate_answer(question, expected, answer)
+    finally:
+        thread_deadline.deadline = None
+        incr_metric("evaluations_in_flight", -1)
+        eval_slots.release()
+
+def start_speculation(session_id, attempt, step, q_data, answer):
+    key = (session_id, attempt, step)
+    digest = answer_hash(answer)
+    with single_flight_lock:
+        previous = speculations.get(key)
+        if previous is not None and previous["hash"] == digest and previous["question"] == q_data["q"]:
+            return False
+    future = speculation_executor.submit(run_speculation, q_data["q"], q_data["exp"], answer, request_deadline())
+    with single_flight_lock:
+        speculations.pop(key, None)
+        speculations[key] = {"hash": digest, "question": q_data["q"], "future": future}
+        while len(speculations) > SPECULATION_CACHE_SIZE:
+            speculations.popitem(last=False)
+    if previous is not None:
+        previous["future"].cancel()
+    incr_metric("speculations_started")
+    return True
+
+# Result of a matching speculative evaluation (waiting for it if still running), else None
+def speculative_result(session_id, attempt, step, q_data, user_input):
+    with single_flight_lock:
+        speculation = speculations.pop((session_id, attempt, step), None)
+    if speculation is None:
+        return None
+    if speculation["hash"] != answer_hash(user_input) or speculation["question"] != q_data["q"]:
+        speculation["future"].cancel()
+        incr_metric("speculation_misses")
+        return None
+    started = time.monotonic()
+    timeout, budget_limited = wait_budget()
+    try:
+        result = speculation["future"].result(timeout=timeout)
+    except TimeoutError:
+        if budget_limited:
+            incr_metric("deadline_exceeded_speculation")
+            return provisional_evaluation(q_data["exp"], user_input)
+        logger.error("Speculative evaluation timed out for session %s", session_id)
+        result = None
+    except Exception as e:
+        logger.error("Speculative evaluation failed for session %s: %s", session_id, e)
+        result = None
+    if result is None:
+        incr_metric("speculation_misses")
+        return None
+    incr_metric("speculation_hits")
+    incr_metric("speculation_hit_wait_seconds_total", time.monotonic() - started)
+    return result
+
+# True to call Gemini, "trial" when this caller holds the half-open trial slot, False to fail fast
+def breaker_allows_call():
+    with breaker_lock:
+        if breaker["state"] == "closed":
+            return True
+        if breaker["state"] == "open" and time.monotonic() - breaker["opened_at"] >= BREAKER_RESET_TIMEOUT:
+            breaker["state"] = "half_open"
+            logger.info("Circuit breaker half-open; sending a trial evaluation")
+        if breaker["state"] == "half_open" and not breaker["trial_in_flight"]:
+            breaker["trial_in_flight"] = True
+            return "trial"
         return False
 
+# Give back a trial slot whose holder never reached Gemini, so the next evaluation makes the trial call
+def release_breaker_trial():
+    with breaker_lock:
+        if breaker["state"] == "half_open":
+            breaker["trial_in_flight"] = False
+
+def record_breaker_success():
+    with breaker_lock:
+        recovered = breaker["state"] != "closed"
+        breaker.update(state="closed", failures=0, trial_in_flight=False)
+    if recovered:
+        logger.info("Circuit breaker closed; draining re-grade queue")
+    kick_regrade_drain(force=recovered)
+
+def record_breaker_failure():
+    with breaker_lock:
+        breaker["failures"] += 1
+        breaker["trial_in_flight"] = False
+        if breaker["state"] == "half_open" or breaker["failures"] >= BREAKER_FAILURE_THRESHOLD:
+            if breaker["state"] != "open":
+                logger.warning("Circuit breaker opened after %d consecutive failures", breaker['failures'])
+                incr_metric("breaker_opened")
+            breaker["state"] = "open"
+            breaker["opened_at"] = time.monotonic()
+
+# Start a background drain unless one is running; without force, check at most every REGRADE_CHECK_INTERVAL
+def kick_regrade_drain(force=False):
+    with regrade_lock:
+        if regrade_state["draining"]:
+            return
+        if not force and time.monotonic() - regrade_state["last_check"] < REGRADE_CHECK_INTERVAL:
+            return
+        regrade_state["draining"] = True
+        regrade_state["last_check"] = time.monotonic()
+    background_executor.submit(drain_regrade_queue_task)
+
+def drain_regrade_queue_task():
+    try:
+        drain_regrade_queue()
+    except Exception as e:
+        logger.error("Error draining re-grade queue: %s", e)
+    finally:
+        with regrade_lock:
+            regrade_state["draining"] = False
+
+# Count a failed attempt on a queued answer; after REGRADE_MAX_ATTEMPTS it is moved to the dead-letter
+# collection so it no longer holds up the queue
+def regrade_attempt_failed(doc, item, error):
+    attempts = item.get("attempts", 0) + 1
+    if attempts < REGRADE_MAX_ATTEMPTS:
+        doc.reference.update({"attempts": attempts, "last_error": str(error)[:500]})
+        return
+    batch = db.batch()
+    batch.set(db.collection("regrade_dead_letter").document(doc.id), {
+        **item,
+        "attempts": attempts,
+        "last_error": str(error)[:500],
+        "dead_lettered_at": firestore.SERVER_TIMESTAMP
+    })
+    batch.delete(doc.reference)
+    batch.commit()
+    incr_metric("regrade_dead_lettered")
+    logger.error("Moved queued answer %s to the dead-letter collection after %d attempts: %s", doc.id, attempts, error)
+
+# Re-grade queued provisional answers while the breaker lets calls through. Each pass walks the queue once
+# past a cursor, so an answer that failed is not retried until the next drain. Only Gemini call failures
+# count against the breaker; an unparseable response or a failed write only counts against the item.
+def drain_regrade_queue(max_items=None):
+    regraded = 0
+    query = db.collection("regrade_queue").order_by("created_at").order_by("__name__").limit(REGRADE_BATCH_SIZE)
+    last = None
+    while max_items is None or regraded < max_items:
+        docs = list((query.start_after(last) if last is not None else query).stream())
+        if not docs:
+            break
+        last = docs[-1]
+        for doc in docs:
+            if not breaker_allows_call():
+                logger.info("Re-grade paused with breaker open after %d answers", regraded)
+                return regraded
+            item = doc.to_dict()
+            try:
+                result = call_evaluator(sanitize_input(item["question"]), sanitize_input(item["expected"]), sanitize_input(item["answer"]))
+            except Exception as e:
+                logger.error("Error re-grading queued answer %s: %s", doc.id, e)
+                regrade_attempt_failed(doc, item, e)
+                record_breaker_failure()
+                return regraded
+            with breaker_lock:
+                breaker.update(state="closed", failures=0, trial_in_flight=False)
+            try:
+                score, feedback = parse_evaluation(result)
+                apply_regrade(item, score, feedback)
+            except Exception as e:
+                logger.error("Error applying re-grade of queued answer %s: %s", doc.id, e)
+                regrade_attempt_failed(doc, item, e)
+                continue
+            doc.reference.delete()
+            update_question_stats([item["question"]], [score])
+            incr_metric("answers_regraded")
+            regraded += 1
+            if max_items is not None and regraded >= max_items:
+                break
+    if regraded:
+        logger.info("Re-graded %d provisional answers", regraded)
+        invalidate_leaderboard()
+    return regraded
+
+@firestore.transactional
+def apply_regrade_txn(transaction, interview_ref, leaderboard_ref, index, score, feedback):
+    details_ref = interview_details_ref(interview_ref)
+    interview = interview_ref.get(transaction=transaction)
+    details = details_ref.get(transaction=transaction)
+    leaderboard = leaderboard_ref.get(transaction=transaction)
+    if not interview.exists:
+        logger.warning("Interview %s for queued re-grade no longer exists", interview_ref.id)
+        return None
+    data = interview.to_dict()
+    results = interview_results(data)
+    if index >= len(results):
+        return None
+    question_ids = [question_id for question_id, _ in results]
+    scores = [result_score for _, result_score in results]
+    scores[index] = score
+    feedbacks, answers = interview_details(data, details)
+    if index < len(feedbacks):
+        feedbacks[index] = feedback
+    provisional = [i for i in data.get("provisional", []) if i != index]
+    bank_questions = bank_version_questions(data.get("bank", DEFAULT_BANK), data.get("bank_version"))
+    score_fields = interview_score_fields(data.get("mode", "sequential"), interview_question_texts(data), scores, bank_questions)
+    avg_score = score_fields["average_score"]
+    transaction.update(interview_ref, {
+        **compact_interview_fields(data, question_ids, scores),
+        **score_fields,
+        "provisional": provisional
+    })
+    transaction.set(details_ref, {"feedbacks": feedbacks, "answers": answers})
+    if not leaderboard.exists or leaderboard.to_dict().get("interview_id") != interview_ref.id:
+        return None
+    transaction.update(leaderboard_ref, {"average_score": avg_score})
+    return avg_score
+
+# Write the re-graded score into the stored interview, and into the leaderboard and ranking when it is the
+# user's latest interview
+def apply_regrade(item, score, feedback):
+    interview_ref = db.collection("users").document(item["user_id"]).collection("interviews").document(item["interview_id"])
+    leaderboard_ref = db.collection("leaderboard").document(item["user_id"])
+    avg_score = apply_regrade_txn(db.transaction(), interview_ref, leaderboard_ref, item["index"], score, feedback)
+    if avg_score is not None and score_ranking["loaded_at"] is not None:
+        record_score(item["user_id"], avg_score)
+
+def is_admin_request():
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def require_admin():
+    if not is_admin_request():
+        abort(403, description="Admin access required")
+
+@app.before_request
+def start_request_log_context():
+    g.request_started = time.monotonic()
+    g.request_id = request.headers.get("X-Request-ID", "")[:64] or uuid.uuid4().hex
+    if request.endpoint not in DEADLINE_EXEMPT_ENDPOINTS:
+        g.deadline = g.request_started + REQUEST_DEADLINE
+
+# A dependency call that ran out of request budget and was not handled on the spot
+@app.errorhandler(DeadlineExceeded)
+def handle_deadline_exceeded(e):
+    logger.warning("Request failed: %s", e)
+    return "The service is busy. Please try again in a moment.", 503, {"Retry-After": str(EVAL_RETRY_AFTER)}
+
+@app.after_request
+def add_request_id(response):
+    if "request_id" in g:
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
 # Make session permanent
 @app.before_request
 def make_session_permanent():
+    # Drafts are posted without cookies; don't hand out a fresh session cookie for them
+    if request.endpoint == "speculate":
+        return
     session.permanent = True
 
 @app.route("/")
 def home():
     session.clear()
-    return render_template("login.html", num_questions=num_questions)
+    default_bank = get_bank(DEFAULT_BANK)
+    return render_cached(
+        ("login", DEFAULT_BANK, default_bank["version"]),
+        "login.html",
+        num_questions=len(default_bank["questions"]),
+        banks=list(QUESTION_BANKS),
+        default_bank=DEFAULT_BANK
+    )
+
+def render_login_error(error):
+    return render_template(
+        "login.html",
+        error=error,
+        num_questions=len(get_bank(DEFAULT_BANK)["questions"]),
+        banks=list(QUESTION_BANKS),
+        default_bank=DEFAULT_BANK
+    )
 
 @app.route("/login", methods=["POST"])
 def login():
     email = sanitize_input(request.form.get("email", ""))
     name = sanitize_input(request.form.get("name", ""))
+    bank_name = request.form.get("bank", DEFAULT_BANK)
 
-    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(email_regex, email):
-        return render_template("login.html", error="Invalid email format", num_questions=num_questions)
+    if not re.match(EMAIL_REGEX, email):
+        return render_login_error("Invalid email format")
     if not name or len(name) < 2:
-        return render_template("login.html", error="Name must be at least 2 characters", num_questions=num_questions)
+        return render_login_error("Name must be at least 2 characters")
+    if bank_name not in QUESTION_BANKS:
+        return render_login_error("Unknown question bank")
 
     try:
-        email_query = db.collection("users").where(filter=FieldFilter("email", "==", email)).get()
+        with firestore_deadline() as options:
+            email_query = db.collection("users").where(filter=FieldFilter("email", "==", email)).get(**options)
         if email_query:
             user_doc = email_query[0]
             user_id = user_doc.id
             if user_doc.to_dict().get("name") != name:
-                db.collection("users").document(user_id).update({"name": name})
-            logger.info(f"User {user_id} logged in")
+                with firestore_deadline() as options:
+                    db.collection("users").document(user_id).update({"name": name}, **options)
+            logger.info("User %s logged in", user_id)
         else:
             user_id = generate_user_id(name)
-            db.collection("users").document(user_id).set({
-                "name": name,
-                "email": email,
-                "created_at": firestore.SERVER_TIMESTAMP
-            })
-            logger.info(f"New user created with User ID: {user_id}")
+            with firestore_deadline() as options:
+                db.collection("users").document(user_id).set({
+                    "name": name,
+                    "email": email,
+                    "created_at": firestore.SERVER_TIMESTAMP
+                }, **options)
+            logger.info("New user created with User ID: %s", user_id)
 
         session["user_id"] = user_id
         session["user_email"] = email
         session["user_name"] = name
         session["session_id"] = str(uuid.uuid4())
+        session["bank"] = bank_name
         session.modified = True  # Ensure session updates
-        db.collection("sessions").document(session["session_id"]).set({
-            "user_id": user_id,
-            "created_at": firestore.SERVER_TIMESTAMP
-        })
-        logger.info(f"Session {session['session_id']} created for user {user_id}")
+        with firestore_deadline() as options:
+            db.collection("sessions").document(session["session_id"]).set({
+                "user_id": user_id,
+                "bank": bank_name,
+                "created_at": firestore.SERVER_TIMESTAMP
+            }, **options)
+        logger.info("Session %s created for user %s", session["session_id"], user_id)
         return redirect(url_for("guidelines", session_id=session["session_id"]))
     except Exception as e:
-        logger.error(f"Login/Registration error: {str(e)}")
-        return render_template("login.html", error=f"Registration failed: {str(e)[:100]}", num_questions=num_questions)
+        logger.error("Login/Registration error: %s", e)
+        return render_login_error(f"Registration failed: {str(e)[:100]}")
 
 @app.route("/guidelines/<session_id>")
 def guidelines(session_id):
     if session.get("session_id") != session_id or not validate_session_id(session_id):
-        logger.error(f"Invalid session access attempt for session_id: {session_id}")
+        logger.error("Invalid session access attempt for session_id: %s", session_id)
         abort(403, description="Invalid session")
-    return render_template("guidelines.html", session_id=session_id)
+    bank = get_bank(session.get("bank", DEFAULT_BANK))
+    # Not render_cached: the page links to this session's start URL, so every entry would be used once
+    return render_template("guidelines.html", session_id=session_id, num_questions=len(bank["questions"]))
 
 @app.route("/start/<session_id>")
 def start(session_id):
     if session.get("session_id") != session_id or not validate_session_id(session_id):
-        logger.error(f"Invalid session access attempt for session_id: {session_id}")
+        logger.error("Invalid session access attempt for session_id: %s", session_id)
         abort(403, description="Invalid or tampered session URL")
+    bank = get_bank(session.get("bank", DEFAULT_BANK))
+    record_bank_use(bank["name"])
+    session["bank"] = bank["name"]
+    session["bank_version"] = bank["version"]
     session["step"] = 0
     session["scores"] = []
-    session["feedbacks"] = []
-    session["questions_asked"] = []
+    session["asked_indices"] = []
+    session["provisional"] = []
+    session["mode"] = INTERVIEW_MODE
+    session["attempt"] = uuid.uuid4().hex[:8]  # scopes stored evaluation results to this run
+    session["finished"] = False
+    if INTERVIEW_MODE == "adaptive":
+        session["current_question"] = choose_next_question(bank["questions"], [], [])
     session.modified = True  # Ensure session updates
-    logger.info(f"Interview started for session {session_id}")
+    logger.info("Interview started for session %s", session_id)
     return redirect(url_for("interview", session_id=session_id))
 
 @app.route("/interview/<session_id>", methods=["GET", "POST"])
 def interview(session_id):
     if session.get("step") is None:
-        logger.error(f"Session step not initialized for session {session_id}")
+        logger.error("Session step not initialized for session %s", session_id)
         return redirect(url_for("start", session_id=session_id))
     if session.get("session_id") != session_id or not validate_session_id(session_id):
-        logger.error(f"Invalid session access attempt for session_id: {session_id}")
+        logger.error("Invalid session access attempt for session_id: %s", session_id)
         abort(403, description="Invalid or tampered session URL")
 
+    # Stay on the bank version the interview started with, even if the bank was reloaded since
+    bank_questions = bank_version_questions(session.get("bank", DEFAULT_BANK), session.get("bank_version"))
+    num_questions = len(bank_questions)
     step = session.get("step", 0)
-    if step >= num_questions:
+    adaptive = session.get("mode") == "adaptive"
+    question_index = session.get("current_question", step) if adaptive else step
+    if step >= num_questions or question_index >= num_questions or session.get("finished"):
         return redirect(url_for("summary", session_id=session_id))
 
-    q_data = questions[step]
+    q_data = bank_questions[question_index]
     question_text = q_data["q"]
-    logger.info(f"Displaying question {step + 1} for session {session_id}")
+    logger.info("Displaying question %d for session %s", step + 1, session_id, extra={"sampled": True})
 
     if request.method == "POST":
         user_input = sanitize_input(request.form.get("answer", ""))
         if user_input:
             try:
-                eval_result = evaluate_answer(q_data["q"], q_data["exp"], user_input)
-                score_str = eval_result.split("Score: ")[1].split(f"/{MAX_SCORE}")[0].strip()
-                score = int(float(score_str))
-                feedback = eval_result.split("Feedback: ")[1].strip()
+                eval_result = evaluate_once(session_id, session.get("attempt", ""), step, q_data, user_input, request.remote_addr)
+            except EvaluationRejected as e:
+                logger.warning("Evaluation rejected (%s) for session %s", e.reason, session_id)
+                response = make_response(render_template(
+                    "interview.html", step=step+1, question=question_text, num_questions=num_questions,
+                    adaptive=adaptive, session_id=session_id, answer=user_input,
+                    error=f"The evaluator is busy. Please resubmit in {e.retry_after} seconds."
+                ), 429)
+                response.headers["Retry-After"] = str(e.retry_after)
+                return response
+            try:
+                score = parse_evaluation(eval_result)[0]
             except Exception as e:
-                logger.error(f"Error parsing evaluation for session {session_id}: {str(e)}")
+                logger.error("Error parsing evaluation for session %s: %s", session_id, e)
                 score = 0
-                feedback = "Evaluation failed"
+            if eval_result.startswith(PROVISIONAL_MARKER):
+                session.setdefault("provisional", []).append(len(session["scores"]))
+            # Only scores and question indices go into the cookie; feedback is rebuilt from the stored evaluations
             session["scores"].append(score)
-            session["feedbacks"].append(feedback)
-            session["questions_asked"].append(question_text)
+            session.setdefault("asked_indices", []).append(question_index)
             session["step"] = step + 1
+            if adaptive:
+                next_question = choose_next_question(bank_questions, session["asked_indices"], session["scores"])
+                if next_question is None:
+                    session["finished"] = True
+                else:
+                    session["current_question"] = next_question
             session.modified = True  # Ensure session updates
-            if session["step"] >= num_questions:
+            if session["step"] >= num_questions or session.get("finished"):
                 return redirect(url_for("summary", session_id=session_id))
             return redirect(url_for("interview", session_id=session_id))
 
-    response = make_response(render_template("interview.html", step=step+1, question=question_text, num_questions=num_questions, session_id=session_id))
-    session_cookie = response.headers.get("Set-Cookie")
-    if session_cookie:
-        cookie_size = len(session_cookie.encode("utf-8"))
-        logger.info(f"Session cookie size: {cookie_size} bytes")
+    response = make_response(render_template(
+        "interview.html", step=step+1, question=question_text, num_questions=num_questions, adaptive=adaptive,
+        session_id=session_id, speculate=SPECULATIVE_EVAL, attempt=session.get("attempt", ""), question_index=question_index
+    ))
+    if logger.isEnabledFor(logging.DEBUG):
+        session_cookie = response.headers.get("Set-Cookie")
+        if session_cookie:
+            logger.debug("Session cookie size: %d bytes", len(session_cookie.encode("utf-8")))
     return response
 
+# Count one speculation against the session's cap, or return False when the cap is reached. Concurrent
+# drafts of one session go through the transaction one at a time, so they cannot overshoot the cap.
+@firestore.transactional
+def claim_speculation_txn(transaction, session_ref, options):
+    snapshot = session_ref.get(transaction=transaction, **options)
+    count = (snapshot.to_dict() or {}).get("speculations", 0)
+    if count >= SPECULATION_MAX_PER_SESSION:
+        return False
+    transaction.update(session_ref, {"speculations": count + 1})
+    return True
+
+# Draft answers for speculative evaluation. The page sends these without cookies so a late response
+# can never overwrite the session cookie set by the final submit; the session_id in the URL is checked
+# against Firestore instead.
+@app.route("/speculate/<session_id>", methods=["POST"])
+def speculate(session_id):
+    if not SPECULATIVE_EVAL:
+        abort(404)
+    if not validate_session_id(session_id):
+        abort(403, description="Invalid session")
+    payload = request.get_json(silent=True) or {}
+    try:
+        step = int(payload["step"])
+        question_index = int(payload["question_index"])
+        attempt = str(payload["attempt"])[:16]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Invalid draft"}), 400
+    answer = sanitize_input(payload.get("answer", ""))
+    bank_questions = get_bank(g.session_doc.get("bank", DEFAULT_BANK))["questions"]
+    if not answer or not 0 <= question_index < len(bank_questions):
+        return jsonify({"error": "Invalid draft"}), 400
+    if stored_evaluation(session_id, attempt, step) is not None:
+        return jsonify({"status": "graded"})
+    session_ref = db.collection("sessions").document(session_id)
+    try:
+        with firestore_deadline() as options:
+            claimed = g.session_doc.get("speculations", 0) < SPECULATION_MAX_PER_SESSION and claim_speculation_txn(db.transaction(), session_ref, options)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error("Error counting speculation for session %s: %s", session_id, e)
+        claimed = False
+    if not claimed:
+        incr_metric("speculations_skipped_cap")
+        return jsonify({"status": "capped"})
+
+    if start_speculation(session_id, attempt, step, bank_questions[question_index], answer):
+        return jsonify({"status": "started"}), 202
+    # The draft was already being graded; give the claimed slot back
+    try:
+        with firestore_deadline() as options:
+            session_ref.update({"speculations": firestore.Increment(-1)}, **options)
+    except Exception as e:
+        logger.error("Error counting speculation for session %s: %s", session_id, e)
+    return jsonify({"status": "unchanged"})
+
 @app.route("/summary/<session_id>")
 def summary(session_id):
     if session.get("session_id") != session_id or not validate_session_id(session_id):
-        logger.error(f"Invalid session access attempt for session_id: {session_id}")
+        logger.error("Invalid session access attempt for session_id: %s", session_id)
         abort(403, description="Invalid or tampered session URL")
 
     scores = session.get("scores", [])
-    feedbacks = session.get("feedbacks", [])
-    questions_asked = session.get("questions_asked", [])
+    asked_indices = session.get("asked_indices", [])
+    mode = session.get("mode", "sequential")
+    bank_name = get_bank(session.get("bank", DEFAULT_BANK))["name"]
+    bank_version = session.get("bank_version") or get_bank(bank_name)["version"]
     user_id = session.get("user_id")
     user_email = session.get("user_email")
     user_name = session.get("user_name")
@@ -353,36 +1995,85 @@ def summary(session_id):
         return redirect(url_for("home"))
 
     try:
-        avg_score = sum(scores) / len(scores)
-        basics_avg = sum(scores[:3]) / min(3, len(scores)) if len(scores) >= 3 else 0
-        advanced_avg = sum(scores[6:]) / len(scores[6:]) if len(scores) > 6 else 0
-        strengths = "Strong in basics" if basics_avg > 7 else "Needs basics improvement"
-        weaknesses = "Improve advanced skills" if advanced_avg < 7 else "Good advanced skills"
+        bank_questions = bank_version_questions(bank_name, bank_version)
+        asked = [bank_questions[index] if index < len(bank_questions) else {"q": "", "exp": ""} for index in asked_indices]
+        questions_asked = [q["q"] for q in asked]
+        attempt = session.get("attempt", "")
+        feedbacks = [stored_feedback(session_id, attempt, step) for step in range(len(scores))]
+        graded = (getattr(g, "session_doc", None) or {}).get("graded", {})
+        answers = [graded.get(f"{attempt}_{step}", {}).get("answer", "") for step in range(len(scores))]
+
+        score_fields = interview_score_fields(mode, questions_asked, scores, bank_questions)
+        avg_score = score_fields["average_score"]
+        strengths, weaknesses = interview_assessment(mode, questions_asked, scores)
         detailed_feedback = list(zip(questions_asked, feedbacks, scores))
 
-        # Store results in Firestore (no history needed)
-        db.collection("users").document(user_id).collection("interviews").add({
+        # Store results in Firestore (no history needed) together with the user's leaderboard entry
+        provisional = [index for index in session.get("provisional", []) if index < len(scores)]
+        batch = db.batch()
+        interview_ref = db.collection("users").document(user_id).collection("interviews").document()
+        batch.set(interview_ref, {
             "timestamp": firestore.SERVER_TIMESTAMP,
-            "scores": scores,
-            "feedbacks": feedbacks,
-            "questions": questions_asked,
-            "average_score": avg_score,
+            "results": encode_results([question_key(question) for question in questions_asked], scores),
+            "bank": bank_name,
+            "bank_version": bank_version,
+            "rubric_version": rubric_version(bank_version),
+            **score_fields,
             "strengths": strengths,
-            "weaknesses": weaknesses
+            "weaknesses": weaknesses,
+            "mode": mode,
+            "questions_answered": len(scores),
+            "provisional": provisional
         })
+        batch.set(interview_details_ref(interview_ref), {"feedbacks": feedbacks, "answers": answers})
+        for index in provisional:
+            batch.set(db.collection("regrade_queue").document(), {
+                "user_id": user_id,
+                "interview_id": interview_ref.id,
+                "index": index,
+                "question": questions_asked[index],
+                "expected": asked[index]["exp"],
+                "answer": answers[index],
+                "created_at": firestore.SERVER_TIMESTAMP
+            })
+        batch.set(db.collection("leaderboard").document(user_id), leaderboard_entry(user_name, avg_score, interview_id=interview_ref.id))
+        batch.set(db.collection("interview_metrics").document(mode), {
+            "interviews": firestore.Increment(1),
+            "questions_answered": firestore.Increment(len(scores))
+        }, merge=True)
+        with firestore_deadline() as options:
+            batch.commit(**options)
+        invalidate_leaderboard()
+        # Provisional scores stay out of the question statistics until they are re-graded
+        graded = [(question, score) for i, (question, score) in enumerate(zip(questions_asked, scores)) if i not in provisional]
+        background_executor.submit(update_question_stats, [question for question, _ in graded], [score for _, score in graded])
+        if provisional:
+            logger.warning("Queued %d provisional answers for re-grading (session %s)", len(provisional), session_id)
+
+        ranking = None
+        try:
+            ensure_score_ranking()
+            record_score(user_id, avg_score)
+            ranking = get_rank(avg_score)
+        except Exception as e:
+            logger.error("Error computing rank for user %s: %s", user_id, e)
 
         # Send summary email
         summary_data = {
             "avg_score": avg_score,
             "strengths": strengths,
             "weaknesses": weaknesses,
-            "detailed_feedback": detailed_feedback
+            "detailed_feedback": detailed_feedback,
+            "ranking": ranking
         }
         send_summary_email(user_email, user_name, user_id, summary_data)
 
-        # Clear session after summary
+        # Clear session after summary, keeping who the candidate is so they can open their history
         session.clear()
-        logger.info(f"Session {session_id} cleared after summary")
+        session["user_id"] = user_id
+        session["user_name"] = user_name
+        session["user_email"] = user_email
+        logger.info("Session %s cleared after summary", session_id)
 
         return render_template(
             "summary.html",
@@ -390,11 +2081,12 @@ def summary(session_id):
             strengths=strengths,
             weaknesses=weaknesses,
             detailed_feedback=detailed_feedback,
+            ranking=ranking,
             max_score=MAX_SCORE,
-            num_questions=num_questions
+            num_questions=len(bank_questions)
         )
     except Exception as e:
-        logger.error(f"Error processing summary for session {session_id}: {str(e)}")
+        logger.error("Error processing summary for session %s: %s", session_id, e)
         return render_template("error.html", error="Failed to generate summary")
 
 # Handle graceful shutdown
@@ -405,52 +2097,1488 @@ def handle_shutdown(signum, frame):
 signal.signal(signal.SIGINT, handle_shutdown)
 signal.signal(signal.SIGTERM, handle_shutdown)
 
+# Opaque cursor: sort key of the last entry on the previous page plus its rank
+def encode_leaderboard_cursor(average_score, timestamp, user_id, rank):
+    payload = {
+        "s": average_score,
+        "t": (timestamp - EPOCH) // timedelta(microseconds=1),
+        "id": user_id,
+        "n": rank
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_leaderboard_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = {
+            "average_score": float(payload["s"]),
+            "timestamp": EPOCH + timedelta(microseconds=int(payload["t"])),
+            "__name__": str(payload["id"])
+        }
+        return values, int(payload["n"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid leaderboard cursor") from e
+
+# One page of the leaderboard: score descending, earlier timestamp first on ties, user_id last
+# (needs the composite index in firestore.indexes.json)
+def fetch_leaderboard_page(cursor=None, limit=LEADERBOARD_PAGE_SIZE):
+    query = (
+        db.collection("leaderboard")
+        .order_by("average_score", direction=firestore.Query.DESCENDING)
+        .order_by("timestamp")
+        .order_by("__name__")
+    )
+    rank = 0
+    if cursor:
+        values, rank = decode_leaderboard_cursor(cursor)
+        query = query.start_after(values)
+    with firestore_deadline() as options:
+        docs = list(query.limit(limit + 1).stream(**options))
+
+    entries = []
+    for doc in docs[:limit]:
+        data = doc.to_dict()
+        rank += 1
+        timestamp = data.get("timestamp")
+        entries.append({
+            "rank": rank,
+            "user_id": doc.id,
+            "user_name": data.get("user_name", "Unknown"),
+            "avg_score": round(data.get("average_score", 0), 2),
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S") if timestamp else "N/A"
+        })
+
+    next_cursor = None
+    if len(docs) > limit:
+        last = docs[limit - 1]
+        last_data = last.to_dict()
+        next_cursor = encode_leaderboard_cursor(last_data["average_score"], last_data["timestamp"], last.id, rank)
+    return {"entries": entries, "next_cursor": next_cursor}
+
+# Leaderboard entry for a user's latest interview (written alongside the interview itself)
+def leaderboard_entry(user_name, average_score, timestamp=firestore.SERVER_TIMESTAMP, interview_id=None):
+    return {
+        "user_name": user_name,
+        "average_score": average_score,
+        "timestamp": timestamp,
+        "interview_id": interview_id
+    }
+
+# Full scans fan out one query per user over a bounded pool; each query reads only that user's latest interview
+LEADERBOARD_SCAN_WORKERS = int(os.getenv("LEADERBOARD_SCAN_WORKERS", "16"))
+LEADERBOARD_SCAN_PAGE_SIZE = 400  # users per page, also the size of each write batch
+
+def latest_interview(user_id):
+    docs = list(
+        db.collection("users").document(user_id).collection("interviews")
+        .order_by("timestamp", direction=firestore.Query.DESCENDING)
+        .select(["timestamp", "average_score"])
+        .limit(1)
+        .stream()
+    )
+    return docs[0] if docs else None
+
+# Yield pages of users; the pool works on one page while nothing else is held in memory
+def iter_user_pages(page_size=LEADERBOARD_SCAN_PAGE_SIZE):
+    query = db.collection("users").order_by("__name__").select(["name"]).limit(page_size)
+    last = None
+    while True:
+        page = list((query.start_after(last) if last is not None else query).stream())
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+# Rebuild the leaderboard collection from every user's latest interview (one-off backfill)
+def rebuild_leaderboard_index(workers=LEADERBOARD_SCAN_WORKERS):
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="leaderboard-scan") as executor:
+        for users in iter_user_pages():
+            batch = db.batch()
+            pending = 0
+            for user, interview in zip(users, executor.map(lambda user: latest_interview(user.id), users)):
+                if interview is None:
+                    continue
+                interview_data = interview.to_dict()
+                batch.set(
+                    db.collection("leaderboard").document(user.id),
+                    leaderboard_entry(
+                        user.to_dict().get("name", "Unknown"), interview_data.get("average_score", 0),
+                        interview_data["timestamp"], interview.id
+                    )
+                )
+                pending += 1
+            if pending:
+                batch.commit()
+                written += pending
+    logger.info("Leaderboard index rebuilt with %d entries", written)
+    return written
+
+@app.cli.command("rebuild-leaderboard")
+@click.option("--workers", default=LEADERBOARD_SCAN_WORKERS, show_default=True, help="Concurrent per-user queries")
+def rebuild_leaderboard_command(workers):
+    started = time.monotonic()
+    written = rebuild_leaderboard_index(workers=workers)
+    click.echo(f"Rebuilt leaderboard with {written} entries in {time.monotonic() - started:.1f}s")
+
+# First leaderboard page cached per process; refreshed after LEADERBOARD_CACHE_TTL or a new interview
+def get_leaderboard_data():
+    with leaderboard_lock:
+        if leaderboard_state["data"] is None or time.time() - leaderboard_state["loaded_at"] > LEADERBOARD_CACHE_TTL:
+            leaderboard_state["data"] = fetch_leaderboard_page()
+            leaderboard_state["loaded_at"] = time.time()
+            leaderboard_state["generation"] += 1
+            logger.info("Leaderboard data fetched successfully", extra={"sampled": True})
+        return leaderboard_state["data"], leaderboard_state["generation"]
+
+def invalidate_leaderboard():
+    with leaderboard_lock:
+        leaderboard_state["data"] = None
+
+# Rebuild the sorted score array from the leaderboard collection (only the score field is read). Scores
+# recorded while the collection streams are kept, since the stream may have passed their documents.
+def load_score_ranking():
+    with score_ranking_lock:
+        score_ranking["recorded"] = {}
+    by_user = {}
+    with firestore_deadline() as options:
+        for doc in db.collection("leaderboard").select(["average_score"]).stream(**options):
+            by_user[doc.id] = doc.to_dict().get("average_score", 0)
+    with score_ranking_lock:
+        by_user.update(score_ranking["recorded"])
+        score_ranking["by_user"] = by_user
+        score_ranking["scores"] = sorted(by_user.values())
+        score_ranking["loaded_at"] = time.time()
+    logger.info("Score ranking loaded with %d entries", len(by_user))
+
+def refresh_score_ranking():
+    try:
+        load_score_ranking()
+    except Exception as e:
+        logger.error("Error loading score ranking: %s", e)
+    finally:
+        with score_ranking_lock:
+            score_ranking["refreshing"] = False
+
+# Start a background reload when the ranking is missing or older than RANKING_RELOAD_INTERVAL. Never
+# blocks: until the first load finishes, get_rank() has nothing to rank against.
+def ensure_score_ranking():
+    with score_ranking_lock:
+        loaded_at = score_ranking["loaded_at"]
+        if score_ranking["refreshing"] or (loaded_at is not None and time.time() - loaded_at <= RANKING_RELOAD_INTERVAL):
+            return
+        score_ranking["refreshing"] = True
+    threading.Thread(target=refresh_score_ranking, name="score-ranking", daemon=True).start()
+
+# Replace a user's previous score with their latest one
+def record_score(user_id, score):
+    with score_ranking_lock:
+        scores = score_ranking["scores"]
+        previous = score_ranking["by_user"].get(user_id)
+        if previous is not None:
+            del scores[bisect.bisect_left(scores, previous)]
+        bisect.insort(scores, score)
+        score_ranking["by_user"][user_id] = score
+        if score_ranking["refreshing"]:
+            score_ranking["recorded"][user_id] = score
+
+# Rank 1 is the best score; percentile is the share of candidates with a strictly lower score
+def get_rank(score):
+    with score_ranking_lock:
+        scores = score_ranking["scores"]
+        total = len(scores)
+        if not total or score_ranking["loaded_at"] is None:
+            return None
+        return {
+            "rank": total - bisect.bisect_right(scores, score) + 1,
+            "total": total,
+            "percentile": 100.0 * bisect.bisect_left(scores, score) / total
+        }
+
+# Stable key for a question's aggregate document
+def question_key(question_text):
+    return hashlib.sha1(question_text.encode("utf-8")).hexdigest()[:16]
+
+# Interviews store their answers as packed (question ID, score) records: 8 bytes of question_key + 1 score byte.
+# Feedback and answers live in a separate details document that is only read on demand.
+RESULT_SIZE = 9
+LEGACY_INTERVIEW_FIELDS = ("questions", "scores", "feedbacks", "answers", "asked_indices")
+
+def encode_results(question_ids, scores):
+    return b"".join(bytes.fromhex(question_id) + bytes([min(max(int(score), 0), 255)]) for question_id, score in zip(question_ids, scores))
+
+# (question ID, score) pairs of a stored interview, for both compact and legacy documents
+def interview_results(data):
+    if "results" in data:
+        packed = data["results"]
+        return [(packed[i:i + 8].hex(), packed[i + 8]) for i in range(0, len(packed), RESULT_SIZE)]
+    return [(question_key(question), score) for question, score in zip(data.get("questions", []), data.get("scores", []))]
+
+def interview_question_texts(data):
+    if "results" not in data:
+        return list(data.get("questions", []))
+    by_id = {question_key(q["q"]): q["q"] for q in bank_version_questions(data.get("bank", DEFAULT_BANK), data.get("bank_version"))}
+    return [by_id.get(question_id, question_id) for question_id, _ in interview_results(data)]
+
+def interview_details_ref(interview_ref):
+    return interview_ref.collection("details").document("answers")
+
+# Feedbacks and answers from the details document, or inline for documents not yet migrated
+def interview_details(data, details_snapshot):
+    if details_snapshot is not None and details_snapshot.exists:
+        details = details_snapshot.to_dict()
+        return list(details.get("feedbacks", [])), list(details.get("answers", []))
+    return list(data.get("feedbacks", [])), list(data.get("answers", []))
+
+# Field updates that store scores in compact form and drop the legacy per-question arrays
+def compact_interview_fields(data, question_ids, scores):
+    fields = {"results": encode_results(question_ids, scores)}
+    for field in LEGACY_INTERVIEW_FIELDS:
+        if field in data:
+            fields[field] = firestore.DELETE_FIELD
+    return fields
+
+# Each question's statistics are split over QUESTION_STATS_SHARDS documents in
+# question_stats/{key}/question_stats_shards, one picked at random per answer, so a popular question is not
+# bound by Firestore's ~1 sustained write per second per document. Readers merge the shards (and the
+# unsharded question_stats/{key} aggregate written before sharding).
+QUESTION_STATS_SHARDS = int(os.getenv("QUESTION_STATS_SHARDS", "10"))
+
+# Fold one graded answer into a shard's running statistics (Welford's algorithm)
+@firestore.transactional
+def update_question_stats_txn(transaction, stats_ref, question_text, score):
+    snapshot = stats_ref.get(transaction=transaction)
+    data = snapshot.to_dict() if snapshot.exists else {}
+    count = data.get("count", 0) + 1
+    mean = data.get("mean", 0.0)
+    delta = score - mean
+    mean += delta / count
+    m2 = data.get("m2", 0.0) + delta * (score - mean)
+    histogram = data.get("histogram", {})
+    bucket = str(max(0, min(MAX_SCORE, int(score))))
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+    transaction.set(stats_ref, {
+        "question": question_text,
+        "count": count,
+        "mean": mean,
+        "m2": m2,
+        "histogram": histogram,
+        "updated_at": firestore.SERVER_TIMESTAMP
+    })
+
+def update_question_stats(questions_asked, scores):
+    for question_text, score in zip(questions_asked, scores):
+        try:
+            stats_ref = (
+                db.collection("question_stats").document(question_key(question_text))
+                .collection("question_stats_shards").document(str(random.randrange(QUESTION_STATS_SHARDS)))
+            )
+            update_question_stats_txn(db.transaction(), stats_ref, question_text, score)
+        except Exception as e:
+            logger.error("Error updating stats for question %s: %s", question_text[:50], e)
+
+# Combine one shard's (count, mean, m2, histogram) into a question's aggregate (Chan et al.'s parallel variance)
+def merge_question_stats(aggregates, key, data):
+    count = data.get("count", 0)
+    merged = aggregates.setdefault(key, {"question": "", "count": 0, "mean": 0.0, "m2": 0.0, "histogram": {}})
+    merged["question"] = merged["question"] or data.get("question", "")
+    if not count:
+        return
+    total = merged["count"] + count
+    delta = data.get("mean", 0.0) - merged["mean"]
+    merged["mean"] += delta * count / total
+    merged["m2"] += data.get("m2", 0.0) + delta ** 2 * merged["count"] * count / total
+    merged["count"] = total
+    for bucket, bucket_count in data.get("histogram", {}).items():
+        merged["histogram"][bucket] = merged["histogram"].get(bucket, 0) + bucket_count
+
+# Merged statistics per question key, read from the shards and the pre-sharding aggregates
+def load_question_stats(fields=None, **options):
+    aggregates = {}
+    unsharded = db.collection("question_stats")
+    shards = db.collection_group("question_stats_shards")
+    if fields is not None:
+        unsharded = unsharded.select(fields)
+        shards = shards.select(fields)
+    for doc in unsharded.stream(**options):
+        merge_question_stats(aggregates, doc.id, doc.to_dict())
+    for doc in shards.stream(**options):
+        merge_question_stats(aggregates, doc.reference.parent.parent.id, doc.to_dict())
+    return aggregates
+
+# Report row built from the merged aggregates only
+def question_stats_report_row(key, data):
+    count = data.get("count", 0)
+    return {
+        "question_key": key,
+        "question": data.get("question", ""),
+        "count": count,
+        "mean": round(data.get("mean", 0.0), 3),
+        "stddev": round(math.sqrt(data.get("m2", 0.0) / (count - 1)), 3) if count > 1 else 0.0,
+        "histogram": {str(bucket): data.get("histogram", {}).get(str(bucket), 0) for bucket in range(MAX_SCORE + 1)}
+    }
+
+# Per-question (mean, sd) from the question_stats aggregates, cached for DIFFICULTY_CACHE_TTL
+def get_question_difficulties():
+    with difficulty_lock:
+        if difficulty_state["data"] is None or time.time() - difficulty_state["loaded_at"] > DIFFICULTY_CACHE_TTL:
+            difficulties = {}
+            try:
+                with firestore_deadline() as options:
+                    for key, data in load_question_stats(["count", "mean", "m2"], **options).items():
+                        count = data["count"]
+                        if count >= ADAPTIVE_MIN_SAMPLES:
+                            difficulties[key] = (data["mean"], math.sqrt(data["m2"] / (count - 1)))
+            except Exception as e:
+                logger.error("Error loading question difficulties: %s", e)
+            difficulty_state["data"] = difficulties
+            difficulty_state["loaded_at"] = time.time()
+        return difficulty_state["data"]
+
+# Questions without enough data are treated as average difficulty with a wide spread
+def question_difficulty(question_text, difficulties):
+    mean, sd = difficulties.get(question_key(question_text), (MAX_SCORE / 2, DEFAULT_QUESTION_SD))
+    return mean, max(sd, 0.5)
+
+# Skill offset from the average candidate: mean of (score - question mean) under a N(0, DEFAULT_QUESTION_SD)
+# prior, the spread between candidates. Each answer is weighted by the noise of this candidate's scores
+# around their own offset (the residual spread, pulled towards ADAPTIVE_NOISE_SD while there are few
+# answers), not by the between-candidate spread in question_stats. Returns (offset, standard error).
+def estimate_skill(questions_asked, scores, difficulties):
+    offsets = [score - question_difficulty(question_text, difficulties)[0] for question_text, score in zip(questions_asked, scores)]
+    if not offsets:
+        return 0.0, DEFAULT_QUESTION_SD
+    mean_offset = sum(offsets) / len(offsets)
+    residuals = sum((offset - mean_offset) ** 2 for offset in offsets)
+    noise_variance = (ADAPTIVE_NOISE_PRIOR_WEIGHT * ADAPTIVE_NOISE_SD ** 2 + residuals) / (ADAPTIVE_NOISE_PRIOR_WEIGHT + len(offsets) - 1)
+    precision = 1 / DEFAULT_QUESTION_SD ** 2 + len(offsets) / noise_variance
+    return sum(offsets) / noise_variance / precision, math.sqrt(1 / precision)
+
+# Questions whose expected score sits near 0 or MAX_SCORE say little about the candidate
+def question_information(mean, sd, skill):
+    expected = min(max((mean + skill) / MAX_SCORE, 0.05), 0.95)
+    return 4 * expected * (1 - expected) / sd ** 2
+
+# Next question index for adaptive mode, or None when the interview should stop
+def choose_next_question(bank_questions, asked_indices, scores):
+    remaining = [index for index in range(len(bank_questions)) if index not in asked_indices]
+    if not remaining:
+        return None
+    difficulties = get_question_difficulties()
+    skill, standard_error = estimate_skill([bank_questions[index]["q"] for index in asked_indices], scores, difficulties)
+    if len(asked_indices) >= ADAPTIVE_MIN_QUESTIONS and standard_error <= ADAPTIVE_TARGET_SE:
+        return None
+    return max(remaining, key=lambda index: question_information(*question_difficulty(bank_questions[index]["q"], difficulties), skill))
+
+# Estimated score on the whole bank for an adaptive interview
+def adaptive_average_score(questions_asked, scores, bank_questions):
+    difficulties = get_question_difficulties()
+    skill, _ = estimate_skill(questions_asked, scores, difficulties)
+    bank_mean = sum(question_difficulty(q["q"], difficulties)[0] for q in bank_questions) / len(bank_questions)
+    return min(max(bank_mean + skill, 0), MAX_SCORE)
+
+# Score fields of an interview document. average_score is always the raw average of the answers, so
+# adaptive and sequential interviews rank alike on the leaderboard; adaptive interviews also store the
+# (shrunk) bank-wide estimate as estimated_score.
+def interview_score_fields(mode, questions_asked, scores, bank_questions):
+    fields = {"average_score": sum(scores) / len(scores)}
+    if mode == "adaptive" and bank_questions and len(questions_asked) == len(scores):
+        fields["estimated_score"] = adaptive_average_score(questions_asked, scores, bank_questions)
+    return fields
+
+# Strengths and weaknesses lines of the summary. Sequential banks run from basics to advanced, so the first
+# three and the answers after the sixth stand for each. Adaptive interviews ask questions in no fixed order
+# and may stop early, so there the easier half of the asked questions (by question_stats mean) stands for
+# the basics and the harder half for advanced skills.
+def interview_assessment(mode, questions_asked, scores):
+    if mode == "adaptive" and len(questions_asked) == len(scores) and len(scores) >= 2:
+        difficulties = get_question_difficulties()
+        by_difficulty = sorted(
+            range(len(scores)),
+            key=lambda index: -question_difficulty(questions_asked[index], difficulties)[0]
+        )
+        half = len(scores) // 2
+        basics = [scores[index] for index in by_difficulty[:half]]
+        advanced = [scores[index] for index in by_difficulty[half:]]
+        basics_avg = sum(basics) / len(basics)
+        advanced_avg = sum(advanced) / len(advanced)
+    else:
+        basics_avg = sum(scores[:3]) / min(3, len(scores)) if len(scores) >= 3 else 0
+        advanced_avg = sum(scores[6:]) / len(scores[6:]) if len(scores) > 6 else 0
+    strengths = "Strong in basics" if basics_avg > 7 else "Needs basics improvement"
+    weaknesses = "Improve advanced skills" if advanced_avg < 7 else "Good advanced skills"
+    return strengths, weaknesses
+
+@app.route("/api/interview-metrics")
+def interview_metrics_report():
+    require_admin()
+    try:
+        metrics = {}
+        for doc in db.collection("interview_metrics").stream():
+            data = doc.to_dict()
+            interviews = data.get("interviews", 0)
+            metrics[doc.id] = {
+                "interviews": interviews,
+                "questions_answered": data.get("questions_answered", 0),
+                "avg_questions_per_interview": round(data.get("questions_answered", 0) / interviews, 2) if interviews else 0
+            }
+        return jsonify({"modes": metrics})
+    except Exception as e:
+        logger.error("Error building interview metrics report: %s", e)
+        return jsonify({"error": "Failed to load interview metrics"}), 500
+
+# Sampling profiler. PROFILE_SAMPLE_RATE of requests (and any admin request sent with "X-Profile: 1") are
+# profiled by one background thread that snapshots the request thread's stack every PROFILE_INTERVAL_MS.
+# Each profile is written to PROFILE_DIR as collapsed stacks ("frame;frame;frame count", the input format of
+# flamegraph.pl and speedscope), keeping the newest PROFILE_MAX_FILES files.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "100"))
+active_profiles = {}  # request thread id -> Counter of collapsed stacks
+recent_profiles = deque(maxlen=PROFILE_HISTORY)
+profiler_lock = threading.Lock()
+profiler_wakeup = threading.Event()
+profiler_state = {"thread": None}
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapsed_stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+def profiler_loop():
+    interval = PROFILE_INTERVAL_MS / 1000
+    while True:
+        profiler_wakeup.wait()
+        with profiler_lock:
+            targets = dict(active_profiles)
+            if not targets:
+                profiler_wakeup.clear()
+                continue
+        frames = sys._current_frames()
+        for thread_id, samples in targets.items():
+            frame = frames.get(thread_id)
+            if frame is not None:
+                samples[collapsed_stack(frame)] += 1
+        del frames
+        time.sleep(interval)
+
+def start_profile():
+    with profiler_lock:
+        active_profiles[threading.get_ident()] = Counter()
+        if profiler_state["thread"] is None:
+            profiler_state["thread"] = threading.Thread(target=profiler_loop, name="profiler", daemon=True)
+            profiler_state["thread"].start()
+    profiler_wakeup.set()
+    return {"started": time.monotonic(), "thread": threading.get_ident()}
+
+def write_profile(route, samples):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{route}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.folded"
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    profiles = sorted(
+        (os.path.join(PROFILE_DIR, entry) for entry in os.listdir(PROFILE_DIR) if entry.endswith(".folded")),
+        key=os.path.getmtime
+    )
+    for old in profiles[:-PROFILE_MAX_FILES]:
+        os.remove(old)
+    return name
+
+def finish_profile(profile, route):
+    with profiler_lock:
+        samples = active_profiles.pop(profile["thread"], Counter())
+    duration = time.monotonic() - profile["started"]
+    file_name = None
+    try:
+        file_name = write_profile(route, samples)
+    except OSError as e:
+        logger.error("Error writing profile for %s: %s", route, e)
+    recent_profiles.append({"route": route, "duration": duration, "samples": samples, "file": file_name})
+    logger.info("Profiled %s in %.0fms (%d samples)", route, duration * 1000, sum(samples.values()))
+
+@app.before_request
+def maybe_start_profile():
+    if request.endpoint in (None, "static"):
+        return
+    requested = request.headers.get("X-Profile") == "1" and is_admin_request()
+    if requested or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+        g.profile = start_profile()
+
+# Runs after streamed responses finish, so exports are profiled end to end
+@app.teardown_request
+def maybe_finish_profile(exc):
+    profile = g.pop("profile", None)
+    if profile is not None:
+        finish_profile(profile, request.endpoint or "unknown")
+
+# Hottest functions over the last N profiled requests: self samples (function on top of the stack) and
+# inclusive samples (function anywhere on the stack, once per sample), converted to milliseconds using each
+# profile's real sample spacing since the sampler thread competes for the GIL
+@app.route("/admin/profiles")
+def profiles_report():
+    require_admin()
+    limit = max(1, min(request.args.get("last", PROFILE_HISTORY, type=int), PROFILE_HISTORY))
+    route = request.args.get("route")
+    profiles = [profile for profile in list(recent_profiles) if not route or profile["route"] == route][-limit:]
+    self_samples = Counter()
+    inclusive_samples = Counter()
+    for profile in profiles:
+        sample_ms = profile["duration"] * 1000 / max(1, sum(profile["samples"].values()))
+        for stack, count in profile["samples"].items():
+            frames = stack.split(";")
+            self_samples[frames[-1]] += count * sample_ms
+            for label in set(frames):
+                inclusive_samples[label] += count * sample_ms
+    top = request.args.get("top", 25, type=int)
+    return jsonify({
+        "profiles": [
+            {"route": p["route"], "duration_ms": round(p["duration"] * 1000, 1), "samples": sum(p["samples"].values()), "file": p["file"]}
+            for p in profiles
+        ],
+        "hottest": [
+            {"function": label, "self_ms": round(ms, 1), "inclusive_ms": round(inclusive_samples[label], 1)}
+            for label, ms in self_samples.most_common(top)
+        ],
+        "cumulative": [
+            {"function": label, "inclusive_ms": round(ms, 1)}
+            for label, ms in inclusive_samples.most_common(top)
+        ]
+    })
+
+@app.route("/admin/metrics")
+def metrics_report():
+    require_admin()
+    with metrics_lock:
+        snapshot = dict(metrics)
+        snapshot["evaluator_tiers"] = {tier: dict(values) for tier, values in metrics.get("evaluator_tiers", {}).items()}
+    for tier, values in snapshot["evaluator_tiers"].items():
+        values["model"] = EVALUATOR_TIERS[tier]["model"]
+        values["seconds_avg"] = values["seconds_total"] / values["calls"] if values["calls"] else 0
+        values["cost_usd_per_call"] = values["cost_usd"] / values["calls"] if values["calls"] else 0
+        values["input_tokens_avg"] = values["input_tokens"] / values["calls"] if values["calls"] else 0
+    admitted = snapshot.get("evaluations_admitted", 0)
+    snapshot["evaluation_queue_wait_seconds_avg"] = snapshot.get("evaluation_queue_wait_seconds_total", 0) / admitted if admitted else 0
+    completed = snapshot.get("evaluations_completed", 0)
+    snapshot["evaluation_seconds_avg"] = snapshot.get("evaluation_seconds_total", 0) / completed if completed else 0
+    hits = snapshot.get("speculation_hits", 0)
+    speculated = hits + snapshot.get("speculation_misses", 0)
+    snapshot["speculation_hit_rate"] = hits / speculated if speculated else 0
+    snapshot["speculation_hit_wait_seconds_avg"] = snapshot.get("speculation_hit_wait_seconds_total", 0) / hits if hits else 0
+    with question_banks_lock:
+        snapshot["question_banks_loaded"] = list(question_banks)
+        snapshot["question_banks_bytes"] = sum(bank["size"] for bank in question_banks.values())
+        snapshot["question_bank_usage"] = dict(bank_usage)
+    with breaker_lock:
+        snapshot["breaker_state"] = breaker["state"]
+        snapshot["breaker_consecutive_failures"] = breaker["failures"]
+    try:
+        snapshot["regrade_backlog"] = db.collection("regrade_queue").count().get()[0][0].value
+    except Exception as e:
+        logger.error("Error counting re-grade backlog: %s", e)
+        snapshot["regrade_backlog"] = None
+    shared = get_shared_cache()
+    if shared is not None:
+        try:
+            snapshot["shared_cache"] = shared.report()
+        except (sqlite3.Error, OSError) as e:
+            logger.error("Error reading shared cache stats: %s", e)
+            snapshot["shared_cache"] = None
+    snapshot["log_queue_depth"] = log_pipeline["listener"].queue.qsize()
+    snapshot["logs_dropped"] = log_stats["dropped"]
+    snapshot["logs_sampled_out"] = log_stats["sampled_out"]
+    return jsonify(snapshot)
+
+@app.route("/api/question-stats")
+def question_stats_report():
+    require_admin()
+    try:
+        rows = [question_stats_report_row(key, data) for key, data in load_question_stats().items()]
+        # Hardest questions (lowest mean score) first
+        rows.sort(key=lambda row: row["mean"])
+        return jsonify({"questions": rows})
+    except Exception as e:
+        logger.error("Error building question stats report: %s", e)
+        return jsonify({"error": "Failed to load question statistics"}), 500
+
 @app.route("/leaderboard")
 def leaderboard():
     try:
-        # Fetch all users from Firestore
-        users_ref = db.collection("users").stream()
-        leaderboard_data = []
-
-        # Iterate through users and their interviews
-        for user in users_ref:
-            user_data = user.to_dict()
-            user_id = user.id
-            user_name = user_data.get("name", "Unknown")
-            interviews_ref = db.collection("users").document(user_id).collection("interviews").stream()
-            
-            # Get the latest interview for each user
-            latest_interview = None
-            latest_timestamp = None
-            for interview in interviews_ref:
-                interview_data = interview.to_dict()
-                timestamp = interview_data.get("timestamp")
-                if timestamp and (latest_timestamp is None or timestamp > latest_timestamp):
-                    latest_timestamp = timestamp
-                    latest_interview = interview_data
-
-            if latest_interview:
-                avg_score = latest_interview.get("average_score", 0)
-                timestamp = latest_timestamp.strftime("%Y-%m-%d %H:%M:%S") if latest_timestamp else "N/A"
-                leaderboard_data.append({
-                    "user_id": user_id,
-                    "user_name": user_name,
-                    "avg_score": round(avg_score, 2),
-                    "timestamp": timestamp
-                })
-
-        # Sort by average score in descending order
-        leaderboard_data = sorted(leaderboard_data, key=lambda x: x["avg_score"], reverse=True)
-        
-        logger.info("Leaderboard data fetched successfully")
-        return render_template("leaderboard.html", leaderboard_data=leaderboard_data)
+        first_page, generation = get_leaderboard_data()
+        return render_cached(
+            ("leaderboard", generation),
+            "leaderboard.html",
+            leaderboard_data=first_page["entries"],
+            next_cursor=first_page["next_cursor"]
+        )
     except Exception as e:
-        logger.error(f"Error fetching leaderboard data: {str(e)}")
+        logger.error("Error fetching leaderboard data: %s", e)
         return render_template("error.html", error="Failed to load leaderboard")
-    
+
+@app.route("/api/leaderboard")
+def leaderboard_api():
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit", LEADERBOARD_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, LEADERBOARD_MAX_PAGE_SIZE))
+    try:
+        if not cursor and limit == LEADERBOARD_PAGE_SIZE:
+            page, _ = get_leaderboard_data()
+        else:
+            page = fetch_leaderboard_page(cursor, limit)
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error fetching leaderboard page: %s", e)
+        return jsonify({"error": "Failed to load leaderboard"}), 500
+
+# Candidate history: a user's own interviews, newest first, read as a projection of the summary fields
+# written by summary() so the packed results and the details document are never loaded
+HISTORY_PAGE_SIZE = 10
+HISTORY_MAX_PAGE_SIZE = 50
+HISTORY_FIELDS = ["timestamp", "bank", "mode", "average_score", "questions_answered", "strengths", "weaknesses", "provisional"]
+
+def encode_history_cursor(timestamp, interview_id):
+    payload = {"t": (timestamp - EPOCH) // timedelta(microseconds=1), "id": interview_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_history_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return {
+            "timestamp": EPOCH + timedelta(microseconds=int(payload["t"])),
+            "__name__": str(payload["id"])
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid history cursor") from e
+
+# One page of a user's interviews. One extra document is read so that the oldest attempt on the page also
+# gets its change from the attempt before it; filtering by bank uses the (bank, timestamp) composite index.
+def fetch_history_page(user_id, cursor=None, limit=HISTORY_PAGE_SIZE, bank=None):
+    query = db.collection("users").document(user_id).collection("interviews")
+    if bank:
+        query = query.where(filter=FieldFilter("bank", "==", bank))
+    query = (
+        query.order_by("timestamp", direction=firestore.Query.DESCENDING)
+        .order_by("__name__", direction=firestore.Query.DESCENDING)
+        .select(HISTORY_FIELDS)
+    )
+    if cursor:
+        query = query.start_after(decode_history_cursor(cursor))
+    with firestore_deadline() as options:
+        docs = list(query.limit(limit + 1).stream(**options))
+
+    entries = []
+    for position, doc in enumerate(docs[:limit]):
+        data = doc.to_dict()
+        timestamp = data.get("timestamp")
+        average_score = data.get("average_score", 0)
+        previous = docs[position + 1].to_dict().get("average_score") if position + 1 < len(docs) else None
+        entries.append({
+            "interview_id": doc.id,
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S") if timestamp else "N/A",
+            "bank": data.get("bank", DEFAULT_BANK),
+            "mode": data.get("mode", "sequential"),
+            "avg_score": round(average_score, 2),
+            "change": round(average_score - previous, 2) if previous is not None else None,
+            "questions_answered": data.get("questions_answered"),
+            "strengths": data.get("strengths"),
+            "weaknesses": data.get("weaknesses"),
+            "provisional": bool(data.get("provisional"))
+        })
+
+    next_cursor = None
+    if len(docs) > limit:
+        last = docs[limit - 1]
+        next_cursor = encode_history_cursor(last.to_dict()["timestamp"], last.id)
+    return {"entries": entries, "next_cursor": next_cursor}
+
+@app.route("/history")
+def history():
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("home"))
+    bank = request.args.get("bank")
+    try:
+        page = fetch_history_page(user_id, bank=bank)
+        return render_template(
+            "history.html",
+            user_name=session.get("user_name"),
+            entries=page["entries"],
+            next_cursor=page["next_cursor"],
+            bank=bank or "",
+            max_score=MAX_SCORE
+        )
+    except Exception as e:
+        logger.error("Error fetching interview history for user %s: %s", user_id, e)
+        return render_template("error.html", error="Failed to load interview history")
+
+@app.route("/api/history")
+def history_api():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Login required"}), 401
+    limit = request.args.get("limit", HISTORY_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    try:
+        return jsonify(fetch_history_page(user_id, request.args.get("cursor"), limit, request.args.get("bank")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error fetching interview history for user %s: %s", user_id, e)
+        return jsonify({"error": "Failed to load interview history"}), 500
+
+# Bulk export of users/*/interviews, streamed page by page so memory stays constant
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet")
+}
+
+# Interview snapshots in timestamp order, fetched EXPORT_PAGE_SIZE at a time
+def iter_interviews(start=None, end=None, page_size=EXPORT_PAGE_SIZE, after=None):
+    query = db.collection_group("interviews")
+    if start:
+        query = query.where(filter=FieldFilter("timestamp", ">=", start))
+    if end:
+        query = query.where(filter=FieldFilter("timestamp", "<", end))
+    query = query.order_by("timestamp").order_by("__name__").limit(page_size)
+    last = after
+    while True:
+        page = query.start_after(last) if last is not None else query
+        docs = list(page.stream())
+        yield from docs
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+# Question columns per row: the header is streamed before any interview is read, so it is sized for the
+# largest configured bank rather than the rows themselves
+def export_question_count():
+    return max(len(get_bank(name)["questions"]) for name in QUESTION_BANKS)
+
+def export_columns(max_questions, include_feedback=False):
+    columns = ["user_id", "interview_id", "timestamp", "bank", "average_score", "mode", "questions_answered", "strengths", "weaknesses"]
+    for n in range(1, max_questions + 1):
+        columns += [f"q{n}_question", f"q{n}_score"] + ([f"q{n}_feedback"] if include_feedback else [])
+    return columns
+
+# One flat row per interview, with questions and scores (and feedback when details are given) laid out per question
+def flatten_interview(doc, max_questions, details=None):
+    data = doc.to_dict()
+    timestamp = data.get("timestamp")
+    results = interview_results(data)
+    row = {
+        "user_id": doc.reference.parent.parent.id,
+        "interview_id": doc.id,
+        "timestamp": timestamp.isoformat() if timestamp else None,
+        "bank": data.get("bank", DEFAULT_BANK),
+        "average_score": data.get("average_score"),
+        "mode": data.get("mode", "sequential"),
+        "questions_answered": data.get("questions_answered", len(results)),
+        "strengths": data.get("strengths"),
+        "weaknesses": data.get("weaknesses")
+    }
+    questions_list = interview_question_texts(data)
+    feedbacks = interview_details(data, details)[0] if details is not None else None
+    for n in range(max_questions):
+        row[f"q{n + 1}_question"] = questions_list[n] if n < len(questions_list) else None
+        row[f"q{n + 1}_score"] = results[n][1] if n < len(results) else None
+        if feedbacks is not None:
+            row[f"q{n + 1}_feedback"] = feedbacks[n] if n < len(feedbacks) else None
+    return row
+
+# Feedback lives in each interview's details document, so it is only read (one get_all per page) when asked for
+def iter_export_rows(start=None, end=None, min_score=None, max_score=None, max_questions=None, include_feedback=False):
+    max_questions = max_questions or export_question_count()
+    for page in iter_row_pages(iter_interviews(start, end)):
+        docs = [
+            doc for doc in page
+            if not ((min_score is not None and (doc.to_dict().get("average_score") or 0) < min_score)
+                    or (max_score is not None and (doc.to_dict().get("average_score") or 0) > max_score))
+        ]
+        details = {}
+        if include_feedback and docs:
+            details = {snapshot.reference.parent.parent.path: snapshot for snapshot in db.get_all([interview_details_ref(doc.reference) for doc in docs])}
+        for doc in docs:
+            yield flatten_interview(doc, max_questions, details.get(doc.reference.path) if include_feedback else None)
+
+# Group rows into pages so each encoder flushes once per page
+def iter_row_pages(rows, page_size=EXPORT_PAGE_SIZE):
+    page = []
+    for row in rows:
+        page.append(row)
+        if len(page) >= page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def encode_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    for page in iter_row_pages(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(page)
+        yield buffer.getvalue().encode("utf-8")
+
+def encode_ndjson(rows, columns):
+    for page in iter_row_pages(rows):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in page).encode("utf-8")
+
+# ParquetWriter writes into this sink; whatever it produced is handed out after each row group
+class ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def encode_parquet(rows, columns):
+    fields = []
+    for column in columns:
+        if column == "average_score":
+            fields.append(pa.field(column, pa.float64()))
+        elif column == "questions_answered" or column.endswith("_score"):
+            fields.append(pa.field(column, pa.int64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    schema = pa.schema(fields)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for page in iter_row_pages(rows):
+        writer.write_table(pa.Table.from_pylist(page, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def export_interviews(export_format, start=None, end=None, min_score=None, max_score=None, max_questions=None, include_feedback=False):
+    max_questions = max_questions or export_question_count()
+    columns = export_columns(max_questions, include_feedback)
+    rows = iter_export_rows(start, end, min_score, max_score, max_questions, include_feedback)
+    encoders = {"csv": encode_csv, "ndjson": encode_ndjson, "parquet": encode_parquet}
+    return encoders[export_format](rows, columns)
+
+# Dates come in as ISO strings; naive values are treated as UTC
+def parse_export_date(value):
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+def check_export_format(export_format):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    if export_format == "parquet" and pq is None:
+        raise ValueError("Parquet export requires the pyarrow package")
+
+@app.route("/admin/export/interviews")
+def export_interviews_endpoint():
+    require_admin()
+    export_format = request.args.get("format", "csv")
+    try:
+        check_export_format(export_format)
+        start = parse_export_date(request.args.get("start"))
+        end = parse_export_date(request.args.get("end"))
+        min_score = request.args.get("min_score", type=float)
+        max_score = request.args.get("max_score", type=float)
+        max_questions = request.args.get("max_questions", type=int)
+        include_feedback = request.args.get("feedback") == "1"
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    logger.info("Exporting interviews as %s (start=%s, end=%s)", export_format, start, end)
+    response = Response(
+        stream_with_context(export_interviews(export_format, start, end, min_score, max_score, max_questions, include_feedback)),
+        mimetype=mimetype
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename=interviews.{extension}"
+    return response
+
+@app.cli.command("export-interviews")
+@click.option("--format", "export_format", default="csv", type=click.Choice(list(EXPORT_FORMATS)))
+@click.option("--start", help="Earliest interview timestamp (ISO date, inclusive)")
+@click.option("--end", help="Latest interview timestamp (ISO date, exclusive)")
+@click.option("--min-score", type=float)
+@click.option("--max-score", type=float)
+@click.option("--max-questions", type=int, help="Per-question column slots (defaults to the largest bank size)")
+@click.option("--feedback", is_flag=True, help="Include per-question feedback (one extra read per interview)")
+@click.option("--output", "-o", type=click.File("wb"), default="-")
+def export_interviews_command(export_format, start, end, min_score, max_score, max_questions, feedback, output):
+    check_export_format(export_format)
+    for chunk in export_interviews(export_format, parse_export_date(start), parse_export_date(end), min_score, max_score, max_questions, feedback):
+        output.write(chunk)
+
+# Storage size of a value/document following Firestore's documented size rules
+def firestore_value_size(value):
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime.datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(firestore_value_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(len(str(key).encode("utf-8")) + 1 + firestore_value_size(item) for key, item in value.items())
+    return 8
+
+def firestore_document_size(path, data):
+    return sum(len(segment.encode("utf-8")) + 1 for segment in path.split("/")) + 16 + firestore_value_size(data) + 32
+
+# Rewrite interviews stored in the old layout (full question text, scores, feedback and answers on the
+# interview document) into packed results plus a details document. Question texts the interviews refer
+# to are kept in a "legacy" version snapshot of their bank.
+def compact_interviews(progress=None):
+    stats = {"scanned": 0, "migrated": 0, "bytes_before": 0, "bytes_after": 0, "details_bytes": 0}
+    legacy_snapshots = {}
+    expected_by_bank = {}
+    batch = db.batch()
+    pending = 0
+
+    def flush():
+        for bank_name, questions_by_id in legacy_snapshots.items():
+            batch.set(db.collection("question_bank_versions").document(f"{bank_name}_legacy"), {
+                "bank": bank_name,
+                "version": "legacy",
+                "questions": list(questions_by_id.values()),
+                "saved_at": firestore.SERVER_TIMESTAMP
+            })
+        batch.commit()
+
+    for doc in iter_interviews():
+        stats["scanned"] += 1
+        data = doc.to_dict()
+        if "results" in data:
+            continue
+        bank_name = data.get("bank", DEFAULT_BANK)
+        if bank_name not in legacy_snapshots:
+            existing = db.collection("question_bank_versions").document(f"{bank_name}_legacy").get()
+            legacy_snapshots[bank_name] = {q["id"]: q for q in (existing.to_dict().get("questions", []) if existing.exists else [])}
+            expected_by_bank[bank_name] = {q["q"]: q["exp"] for q in get_bank(bank_name)["questions"]}
+        for question in data.get("questions", []):
+            legacy_snapshots[bank_name].setdefault(
+                question_key(question),
+                {"id": question_key(question), "q": question, "exp": expected_by_bank[bank_name].get(question, "")}
+            )
+
+        results = interview_results(data)
+        update = {
+            **compact_interview_fields(data, [question_id for question_id, _ in results], [score for _, score in results]),
+            "bank": bank_name,
+            "bank_version": "legacy"
+        }
+        details = {"feedbacks": list(data.get("feedbacks", [])), "answers": list(data.get("answers", []))}
+        compacted = {key: value for key, value in data.items() if key not in LEGACY_INTERVIEW_FIELDS}
+        compacted.update({key: value for key, value in update.items() if value is not firestore.DELETE_FIELD})
+        stats["bytes_before"] += firestore_document_size(doc.reference.path, data)
+        stats["bytes_after"] += firestore_document_size(doc.reference.path, compacted)
+        stats["details_bytes"] += firestore_document_size(interview_details_ref(doc.reference).path, details)
+
+        batch.update(doc.reference, update)
+        batch.set(interview_details_ref(doc.reference), details)
+        stats["migrated"] += 1
+        pending += 2
+        if pending >= 400:
+            flush()
+            batch = db.batch()
+            pending = 0
+            if progress:
+                progress(stats)
+    if pending:
+        flush()
+    migrated = stats["migrated"]
+    stats["avg_bytes_before"] = stats["bytes_before"] / migrated if migrated else 0
+    stats["avg_bytes_after"] = stats["bytes_after"] / migrated if migrated else 0
+    stats["avg_details_bytes"] = stats["details_bytes"] / migrated if migrated else 0
+    logger.info("Interview compaction finished: %s", stats)
+    return stats
+
+# Bulk candidate import: dedupe against existing users, create the rest with batched writes
+# and hand invitations to a pool of SMTP senders that each reuse one connection
+IMPORT_BATCH_SIZE = 400
+INVITE_SENDER_WORKERS = int(os.getenv("INVITE_SENDER_WORKERS", "4"))
+EMAIL_LOOKUP_CHUNK = 30  # Firestore's limit on values in one "in" filter
+APP_BASE_URL = os.getenv("APP_BASE_URL", "http://localhost:5000")
+
+def read_candidates(path):
+    if path.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(path, dtype=str)
+    else:
+        df = pd.read_csv(path, dtype=str)
+    df.columns = [str(column).strip().lower() for column in df.columns]
+    if "name" not in df.columns or "email" not in df.columns:
+        raise ValueError("Candidate file must have 'name' and 'email' columns")
+    return df[["name", "email"]].fillna("").to_dict(orient="records")
+
+# Existing emails among the given ones, from "in" queries of EMAIL_LOOKUP_CHUNK emails each, so only
+# matching users are read (only the email field)
+def find_existing_emails(emails):
+    emails = sorted(set(emails))
+    existing = set()
+    for offset in range(0, len(emails), EMAIL_LOOKUP_CHUNK):
+        query = (
+            db.collection("users")
+            .where(filter=FieldFilter("email", "in", emails[offset:offset + EMAIL_LOOKUP_CHUNK]))
+            .select(["email"])
+        )
+        existing.update(doc.get("email") for doc in query.stream())
+    return existing
+
+# user_ids for a chunk of new candidates, checked against Firestore with one batched read per round
+def allocate_user_ids(names):
+    user_ids = [user_id_candidate(name) for name in names]
+    for counter in range(2, 100):
+        refs = [db.collection("users").document(user_id) for user_id in user_ids]
+        taken = {snapshot.id for snapshot in db.get_all(refs) if snapshot.exists}
+        seen = set()
+        clashes = []
+        for index, user_id in enumerate(user_ids):
+            if user_id in taken or user_id in seen:
+                clashes.append(index)
+            seen.add(user_id)
+        if not clashes:
+            return user_ids
+        for index in clashes:
+            user_ids[index] = user_id_candidate(names[index], counter)
+    raise Exception("Failed to generate unique user_ids")
+
+def open_smtp_connection():
+    server = smtplib.SMTP("smtp.gmail.com", 587, timeout=DEPENDENCY_TIMEOUTS["smtp"])
+    server.starttls()
+    server.login(EMAIL_USER, EMAIL_PASS)
+    return server
+
+# Sender thread: keeps its SMTP connection open across messages, reconnects once on failure
+def invite_sender(invites, stats, stats_lock):
+    server = None
+    while True:
+        invite = invites.get()
+        if invite is None:
+            break
+        user_email, message = invite
+        for attempt in range(2):
+            try:
+                if server is None:
+                    server = open_smtp_connection()
+                server.sendmail(EMAIL_USER, user_email, message)
+                with stats_lock:
+                    stats["invites_sent"] += 1
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                server = None
+                if attempt:
+                    logger.error("Error sending invite to %s: %s", user_email, e)
+                    with stats_lock:
+                        stats["invites_failed"] += 1
+            except Exception as e:
+                # Anything else is specific to this message; retrying will not help and the sender must live on
+                logger.error("Error sending invite to %s: %s", user_email, e)
+                with stats_lock:
+                    stats["invites_failed"] += 1
+                break
+    if server is not None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+# Queue an invite for the senders; returns False instead of blocking forever when every sender has died
+def queue_invite(invites, senders, invite):
+    while any(sender.is_alive() for sender in senders):
+        try:
+            invites.put(invite, timeout=1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def build_invite_message(user_email, user_name, user_id):
+    msg = MIMEMultipart()
+    msg["From"] = EMAIL_USER
+    msg["To"] = user_email
+    msg["Subject"] = "Invitation: AI Excel Interview"
+    html_body = render_template(
+        "invite_mail.html",
+        user_name=user_name,
+        user_id=user_id,
+        user_email=user_email,
+        num_questions=len(get_bank(DEFAULT_BANK)["questions"]),
+        login_url=APP_BASE_URL,
+        current_year=datetime.datetime.now().year
+    )
+    msg.attach(MIMEText(html_body, "html"))
+    return msg.as_string()
+
+def import_candidates(rows, send_invites=True, progress=None):
+    stats = {"rows": len(rows), "invalid": 0, "duplicates": 0, "existing": 0, "created": 0, "invites_sent": 0, "invites_failed": 0}
+    candidates = {}
+    for row in rows:
+        name = sanitize_input(row.get("name", ""))
+        email = sanitize_input(row.get("email", ""))
+        if not re.match(EMAIL_REGEX, email) or len(name) < 2:
+            stats["invalid"] += 1
+        elif email in candidates:
+            stats["duplicates"] += 1
+        else:
+            candidates[email] = name
+
+    existing = find_existing_emails(list(candidates))
+    stats["existing"] = len(existing)
+    new_candidates = [(email, name) for email, name in candidates.items() if email not in existing]
+
+    stats_lock = threading.Lock()
+    invites = queue.Queue(maxsize=INVITE_SENDER_WORKERS * 50)
+    senders = []
+    if send_invites:
+        senders = [
+            threading.Thread(target=invite_sender, args=(invites, stats, stats_lock), daemon=True)
+            for _ in range(INVITE_SENDER_WORKERS)
+        ]
+        for sender in senders:
+            sender.start()
+
+    try:
+        for offset in range(0, len(new_candidates), IMPORT_BATCH_SIZE):
+            chunk = new_candidates[offset:offset + IMPORT_BATCH_SIZE]
+            user_ids = allocate_user_ids([name for _, name in chunk])
+            batch = db.batch()
+            for (email, name), user_id in zip(chunk, user_ids):
+                user_doc = {
+                    "name": name,
+                    "email": email,
+                    "created_at": firestore.SERVER_TIMESTAMP
+                }
+                if send_invites:
+                    user_doc["invited_at"] = firestore.SERVER_TIMESTAMP
+                batch.set(db.collection("users").document(user_id), user_doc)
+            batch.commit()
+            stats["created"] += len(chunk)
+            if send_invites:
+                for (email, name), user_id in zip(chunk, user_ids):
+                    if not queue_invite(invites, senders, (email, build_invite_message(email, name, user_id))):
+                        logger.error("No invite sender is running; invite to %s not sent", email)
+                        with stats_lock:
+                            stats["invites_failed"] += 1
+            if progress:
+                progress(stats["created"], len(new_candidates))
+    finally:
+        for _ in senders:
+            if not queue_invite(invites, senders, None):
+                break
+        for sender in senders:
+            sender.join()
+        # Invites still queued when the last sender died were never sent
+        while True:
+            try:
+                invite = invites.get_nowait()
+            except queue.Empty:
+                break
+            if invite is not None:
+                stats["invites_failed"] += 1
+    logger.info("Candidate import finished: %s", stats)
+    return stats
+
+# Changes whenever the evaluation prompt or any question or expected answer in the bank changes
+def rubric_version(bank_version):
+    return f"{PROMPT_VERSION}-{bank_version}"
+
+def regrade_call(question, expected, answer):
+    if not answer:
+        return 0, "Empty answer"
+    while take_token("regrade", REGRADE_RATE, REGRADE_WORKERS):
+        time.sleep(1 / REGRADE_RATE)
+    return parse_evaluation(call_evaluator(sanitize_input(question), sanitize_input(expected), sanitize_input(answer)))
+
+# Evaluate one page of interviews concurrently and write the new scores in a single batch.
+# Identical (question, answer) pairs share one evaluation through cache. Returns the number of
+# interviews that could not be re-graded; those keep their old rubric_version and are retried next run.
+def regrade_page(docs, rubrics, executor, cache, stats):
+    candidates = []
+    failed = 0
+    for doc in docs:
+        data = doc.to_dict()
+        bank_name = data.get("bank", DEFAULT_BANK)
+        if bank_name not in QUESTION_BANKS:
+            stats["interviews_unknown_bank"] += 1
+            continue
+        if bank_name not in rubrics:
+            bank = get_bank(bank_name)
+            rubrics[bank_name] = (rubric_version(bank["version"]), bank["version"], {question_key(q["q"]): q for q in bank["questions"]})
+        version, bank_version, questions_by_id = rubrics[bank_name]
+        if not questions_by_id:
+            logger.error("Question bank %s is unavailable; cannot re-grade %s", bank_name, doc.reference.path)
+            failed += 1
+            continue
+        if version in (data.get("rubric_version"), data.get("partial_rubric_version")):
+            stats["interviews_current"] += 1
+            continue
+        candidates.append((doc, data, version, bank_version, questions_by_id))
+
+    # Answers are only needed for interviews that will actually be re-graded
+    details = {snapshot.reference.parent.parent.path: snapshot for snapshot in db.get_all([interview_details_ref(doc.reference) for doc, *_ in candidates])} if candidates else {}
+    pending = []
+    for doc, data, version, bank_version, questions_by_id in candidates:
+        feedbacks, answers = interview_details(data, details.get(doc.reference.path))
+        if not answers:
+            stats["interviews_without_answers"] += 1
+            continue
+        results = interview_results(data)
+        futures = []
+        for (question_id, _), answer in zip(results, answers):
+            q = questions_by_id.get(question_id)
+            if q is None:
+                futures.append(None)
+                continue
+            key = (question_id, answer_hash(answer))
+            future = cache.get(key)
+            if future is None:
+                future = executor.submit(regrade_call, q["q"], q["exp"], answer)
+                cache[key] = future
+                while len(cache) > REGRADE_CACHE_SIZE:
+                    cache.popitem(last=False)
+            else:
+                stats["answers_reused"] += 1
+            futures.append(future)
+        pending.append((doc, data, results, feedbacks, answers, futures, version, bank_version))
+
+    leaderboard_refs = {doc.reference.parent.parent.id: db.collection("leaderboard").document(doc.reference.parent.parent.id) for doc, *_ in pending}
+    leaderboard = {snapshot.id: snapshot.to_dict() for snapshot in db.get_all(list(leaderboard_refs.values())) if snapshot.exists} if leaderboard_refs else {}
+
+    batch = db.batch()
+    for doc, data, results, feedbacks, answers, futures, version, bank_version in pending:
+        question_ids = [question_id for question_id, _ in results]
+        scores = [score for _, score in results]
+        try:
+            for index, future in enumerate(futures):
+                if future is not None and index < len(scores):
+                    scores[index], feedback = future.result()
+                    if index < len(feedbacks):
+                        feedbacks[index] = feedback
+        except Exception as e:
+            logger.error("Error re-grading interview %s: %s", doc.reference.path, e)
+            failed += 1
+            continue
+        # Answers to questions no longer in the bank (or without a stored answer) keep their old score. The
+        # interview then keeps its old bank and rubric versions: it is not fully re-graded, and its question
+        # IDs still resolve against the bank version it was taken on. partial_rubric_version keeps later runs
+        # from re-grading it again under the same rubric.
+        skipped = [index for index in range(len(scores)) if index >= len(futures) or futures[index] is None]
+        fields = {"provisional": [index for index in data.get("provisional", []) if index in skipped]}
+        if skipped:
+            bank_version = data.get("bank_version")
+            fields["partial_rubric_version"] = version
+            stats["answers_skipped"] += len(skipped)
+        else:
+            fields.update(bank_version=bank_version, rubric_version=version)
+        regraded = {**data, "results": encode_results(question_ids, scores), "bank_version": bank_version}
+        bank_questions = bank_version_questions(data.get("bank", DEFAULT_BANK), bank_version)
+        score_fields = interview_score_fields(data.get("mode", "sequential"), interview_question_texts(regraded), scores, bank_questions)
+        avg_score = score_fields["average_score"]
+        batch.update(doc.reference, {
+            **compact_interview_fields(data, question_ids, scores),
+            **score_fields,
+            **fields,
+            "regraded_at": firestore.SERVER_TIMESTAMP
+        })
+        batch.set(interview_details_ref(doc.reference), {"feedbacks": feedbacks, "answers": answers})
+        user_id = doc.reference.parent.parent.id
+        if leaderboard.get(user_id, {}).get("interview_id") == doc.id:
+            batch.update(leaderboard_refs[user_id], {"average_score": avg_score})
+        stats["interviews_regraded"] += 1
+        stats["answers_regraded"] += sum(1 for future in futures if future is not None)
+    batch.commit()
+    return failed
+
+# Re-grade every stored interview not yet graded under its bank's current rubric. Progress is checkpointed
+# in regrade_jobs/{prompt version} after each page, so a stopped job resumes where it left off.
+def regrade_interviews(workers=REGRADE_WORKERS, restart=False, limit=None, progress=None):
+    rubrics = {}
+    job_ref = db.collection("regrade_jobs").document(PROMPT_VERSION)
+    job = job_ref.get()
+    checkpoint = job.to_dict() if job.exists and not restart else {}
+    if not checkpoint.get("last_interview"):
+        checkpoint = {}
+    after = db.document(checkpoint["last_interview"]).get() if checkpoint else None
+    stats = {key: checkpoint.get(key, 0) for key in (
+        "interviews_regraded", "interviews_current", "interviews_without_answers", "interviews_unknown_bank",
+        "answers_regraded", "answers_reused", "answers_skipped"
+    )}
+    started = time.time()
+    answers_at_start = stats["answers_regraded"]
+    stats["completed"] = False
+    cache = OrderedDict()
+    logger.info("Re-grading interviews for prompt %s%s", PROMPT_VERSION, f" from {checkpoint['last_interview']}" if after else "")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="regrade") as executor:
+        page = []
+        seen = 0
+        for doc in iter_interviews(after=after):
+            page.append(doc)
+            seen += 1
+            last_page = limit is not None and seen >= limit
+            if len(page) < REGRADE_PAGE_SIZE and not last_page:
+                continue
+            failed = regrade_page(page, rubrics, executor, cache, stats)
+            if failed:
+                logger.error("Re-grading stopped: %d interviews failed; rerun to resume from the last checkpoint", failed)
+                break
+            elapsed = time.time() - started
+            stats["answers_per_second"] = (stats["answers_regraded"] - answers_at_start) / elapsed if elapsed else 0
+            job_ref.set({**stats, "last_interview": page[-1].reference.path, "updated_at": firestore.SERVER_TIMESTAMP})
+            if progress:
+                progress(stats)
+            page = []
+            if last_page:
+                break
+        else:
+            if page and not regrade_page(page, rubrics, executor, cache, stats):
+                page = []
+            stats["completed"] = not page
+
+    elapsed = time.time() - started
+    stats["answers_per_second"] = (stats["answers_regraded"] - answers_at_start) / elapsed if elapsed else 0
+    if stats["completed"]:
+        job_ref.set({**stats, "last_interview": None, "completed_at": firestore.SERVER_TIMESTAMP})
+    invalidate_leaderboard()
+    logger.info("Re-grading for prompt %s finished: %s", PROMPT_VERSION, stats)
+    return stats
+
+@app.cli.command("import-candidates")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--no-invites", is_flag=True, help="Create users without sending invitation emails")
+def import_candidates_command(path, no_invites):
+    rows = read_candidates(path)
+    started = time.time()
+
+    def report(done, total):
+        click.echo(f"Created {done}/{total} candidates ({time.time() - started:.1f}s)")
+
+    stats = import_candidates(rows, send_invites=not no_invites, progress=report)
+    click.echo(
+        f"Done in {time.time() - started:.1f}s: {stats['created']} created, {stats['existing']} already registered, "
+        f"{stats['duplicates']} duplicate rows, {stats['invalid']} invalid rows, "
+        f"{stats['invites_sent']} invites sent, {stats['invites_failed']} invites failed"
+    )
+
+@app.cli.command("drain-regrade-queue")
+@click.option("--max-items", type=int, help="Stop after re-grading this many answers")
+def drain_regrade_queue_command(max_items):
+    click.echo(f"Re-graded {drain_regrade_queue(max_items)} provisional answers")
+
+@app.cli.command("compact-interviews")
+def compact_interviews_command():
+    def report(stats):
+        click.echo(f"Migrated {stats['migrated']} of {stats['scanned']} interviews scanned")
+
+    stats = compact_interviews(progress=report)
+    click.echo(
+        f"Migrated {stats['migrated']} of {stats['scanned']} interviews. Average interview document "
+        f"{stats['avg_bytes_before']:.0f} -> {stats['avg_bytes_after']:.0f} bytes "
+        f"(feedback and answers moved to details documents averaging {stats['avg_details_bytes']:.0f} bytes)"
+    )
+
+# Replay every recorded evaluation through evaluate_answer() and check each score matches the recording
+@app.cli.command("replay-cassette")
+@click.option("--workers", type=int, default=8, show_default=True)
+@click.option("--latency", is_flag=True, help="Sleep for each recorded latency")
+@click.option("--limit", type=int, help="Replay only the first N entries")
+def replay_cassette_command(workers, latency, limit):
+    global EVAL_CASSETTE_MODE, EVAL_REPLAY_LATENCY
+    EVAL_CASSETTE_MODE = "replay"
+    EVAL_REPLAY_LATENCY = latency
+    get_cassette()
+
+    def replay(entry):
+        inputs = entry["inputs"]
+        # The recording's rubric is part of its key; replay grades against the same one
+        if inputs.get("rubric", inputs["expected"]) != inputs["expected"]:
+            remember_rubrics({rubric_key(inputs["expected"]): inputs["rubric"]})
+        replayed = evaluate_answer(inputs["question"], inputs["expected"], inputs["user_answer"])
+        try:
+            return parse_evaluation(replayed)[0] == parse_evaluation(entry["response"])[0]
+        except Exception:
+            return replayed == entry["response"]
+
+    def entries():
+        with open(EVAL_CASSETTE_PATH, encoding="utf-8") as f:
+            for n, line in enumerate(f):
+                if limit is not None and n >= limit:
+                    return
+                yield json.loads(line)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(replay, entries()))
+    elapsed = time.time() - started
+    click.echo(
+        f"Replayed {len(results)} evaluations in {elapsed:.2f}s ({len(results) / elapsed if elapsed else 0:.0f}/s), "
+        f"{results.count(False)} score mismatches, {metrics.get('cassette_misses', 0)} cassette misses"
+    )
+
+# Load or compile the rubrics of each bank, ignoring the lease that keeps workers from compiling the same bank twice
+@app.cli.command("compile-rubrics")
+@click.option("--bank", "bank_names", multiple=True, help="Bank to compile (default: all banks)")
+def compile_rubrics_command(bank_names):
+    for name in bank_names or QUESTION_BANKS:
+        stats = compile_rubrics(get_bank(name))
+        click.echo(
+            f"{name}: {stats['questions']} questions, {stats['reused']} rubrics reused, {stats['compiled']} compiled, "
+            f"{stats['failed']} failed; expected-answer tokens per evaluation {stats['expected_tokens_avg']:.0f} -> {stats['prompt_tokens_avg']:.0f}"
+        )
+
+@app.cli.command("regrade-interviews")
+@click.option("--workers", type=int, default=REGRADE_WORKERS, show_default=True, help="Concurrent Gemini calls")
+@click.option("--restart", is_flag=True, help="Ignore the checkpoint and scan all interviews again")
+@click.option("--limit", type=int, help="Stop after scanning this many interviews")
+def regrade_interviews_command(workers, restart, limit):
+    def report(stats):
+        click.echo(f"{stats['interviews_regraded']} interviews, {stats['answers_regraded']} answers re-graded ({stats['answers_per_second']:.2f} answers/s)")
+
+    stats = regrade_interviews(workers=workers, restart=restart, limit=limit, progress=report)
+    click.echo(
+        f"{'Done' if stats['completed'] else 'Stopped'}: {stats['interviews_regraded']} interviews re-graded, "
+        f"{stats['interviews_current']} already current, {stats['interviews_without_answers']} without stored answers, "
+        f"{stats['answers_regraded']} answers ({stats['answers_reused']} reused) at {stats['answers_per_second']:.2f} answers/s, "
+        f"{stats['answers_skipped']} answers to questions no longer in the bank kept their old scores"
+    )
+
 if __name__ == "__main__":
     try:
         app.run(debug=False)
     except Exception as e:
-        logger.error(f"Flask server error: {str(e)}")
+        logger.error("Flask server error: %s", e)
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,168 @@
+# Benchmark the full-scan leaderboard rebuild (one latest-interview query per user) at different pool sizes.
+# By default it runs against the Firestore emulator: it seeds users/{id}/interviews and overwrites the
+# leaderboard collection, so it refuses to run unless FIRESTORE_EMULATOR_HOST is set.
+#
+#   gcloud emulators firestore start --host-port=localhost:8080
+#   FIRESTORE_EMULATOR_HOST=localhost:8080 python bench_leaderboard.py --users 1000 10000 --workers 1 16 64
+#
+# The emulator answers in well under a millisecond, so it shows little of what the pool saves against real
+# Firestore. --latency MS swaps app.db for an in-memory stand-in that sleeps MS milliseconds per query and
+# per batch commit (a same-region Firestore round trip is roughly 10-30 ms), with no emulator needed:
+#
+#   python bench_leaderboard.py --latency 20 --users 1000 10000 --workers 1 16 64
+#
+# app.py still validates its usual environment variables on import (GEMINI_API_KEY1, EMAIL_USER, EMAIL_PASS,
+# FIREBASE_CREDENTIALS_JSON); the emulator and the stand-in ignore the credentials.
+import argparse
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+
+LATENCY_MODE = any(arg.startswith("--latency") for arg in sys.argv)
+
+if not LATENCY_MODE and not os.getenv("FIRESTORE_EMULATOR_HOST"):
+    sys.exit("Set FIRESTORE_EMULATOR_HOST to a running Firestore emulator (this benchmark writes test data), or pass --latency MS")
+
+import app
+
+SEED_BATCH_SIZE = 400
+
+# In-memory stand-in for the part of the Firestore client the rebuild uses: documents live in one dict per
+# collection path, and every stream() or commit() sleeps for the configured round trip
+class LatencySnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+class LatencyQuery:
+    def __init__(self, store, path, orders=(), limit=None, after=None):
+        self.store = store
+        self.path = path
+        self.orders = list(orders)
+        self._limit = limit
+        self.after = after
+
+    def _copy(self, **changes):
+        query = LatencyQuery(self.store, self.path, self.orders, self._limit, self.after)
+        query.__dict__.update(changes)
+        return query
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self.orders + [(field, direction)])
+
+    def select(self, fields):
+        return self
+
+    def limit(self, count):
+        return self._copy(_limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot.id)
+
+    def stream(self, **options):
+        time.sleep(self.store.latency)
+        with self.store.lock:
+            rows = list(self.store.collections.get(self.path, {}).items())
+        for field, direction in reversed(self.orders):
+            if field == "__name__":
+                rows.sort(key=lambda row: row[0])
+            else:
+                rows.sort(key=lambda row: row[1].get(field), reverse=direction == app.firestore.Query.DESCENDING)
+        if self.after is not None:
+            rows = [row for row in rows if row[0] > self.after]
+        for doc_id, data in rows[:self._limit]:
+            yield LatencySnapshot(doc_id, data)
+
+class LatencyCollection(LatencyQuery):
+    def document(self, doc_id=None):
+        return LatencyDocument(self.store, f"{self.path}/{doc_id or os.urandom(10).hex()}")
+
+class LatencyDocument:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+
+    def collection(self, name):
+        return LatencyCollection(self.store, f"{self.path}/{name}")
+
+class LatencyBatch:
+    def __init__(self, store):
+        self.store = store
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref.path, data))
+
+    def commit(self):
+        time.sleep(self.store.latency)
+        with self.store.lock:
+            for path, data in self.writes:
+                collection, doc_id = path.rsplit("/", 1)
+                self.store.collections.setdefault(collection, {})[doc_id] = data
+        self.writes = []
+
+class LatencyFirestore:
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000
+        self.collections = {}
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return LatencyCollection(self, name)
+
+    def batch(self):
+        return LatencyBatch(self)
+
+# Give users 0..n-1 a few interviews each; users already seeded by an earlier run are kept
+def seed(users, interviews_per_user):
+    existing = sum(1 for _ in app.db.collection("users").select([]).stream())
+    batch = app.db.batch()
+    pending = 0
+    base = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    for n in range(existing, users):
+        user_ref = app.db.collection("users").document(f"bench{n:06d}")
+        batch.set(user_ref, {"name": f"Bench User {n}", "email": f"bench{n}@example.com"})
+        for i in range(interviews_per_user):
+            batch.set(user_ref.collection("interviews").document(), {
+                "timestamp": base + datetime.timedelta(days=i, seconds=n),
+                "average_score": round(random.uniform(0, app.MAX_SCORE), 2)
+            })
+        pending += 1 + interviews_per_user
+        if pending >= SEED_BATCH_SIZE - interviews_per_user:
+            batch.commit()
+            batch = app.db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+def bench(users, workers, interviews_per_user):
+    # Seeding the stand-in is not part of the measurement, so it skips the simulated latency
+    latency = getattr(app.db, "latency", None)
+    if latency is not None:
+        app.db.latency = 0
+    seed(users, interviews_per_user)
+    if latency is not None:
+        app.db.latency = latency
+    for pool_size in workers:
+        started = time.perf_counter()
+        written = app.rebuild_leaderboard_index(workers=pool_size)
+        elapsed = time.perf_counter() - started
+        print(f"{users:>6} users, {pool_size:>3} workers: {elapsed:.2f} s ({written / elapsed:.0f} users/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, app.LEADERBOARD_SCAN_WORKERS])
+    parser.add_argument("--interviews", type=int, default=3, help="Interviews seeded per user")
+    parser.add_argument("--latency", type=float, help="Run against an in-memory stand-in with this many ms per round trip")
+    args = parser.parse_args()
+    if args.latency is not None:
+        app.db = LatencyFirestore(args.latency)
+    for users in sorted(args.users):
+        bench(users, args.workers, args.interviews)
@@ -0,0 +1,43 @@
+# Benchmark Streamlit script-rerun latency of main.py with 1 vs N live sessions.
+# No answers are submitted, so no Gemini calls are made; this measures the per-rerun cost of the
+# script itself (question bank, model handle, rendering the chat history).
+#
+# AppTest keeps a process-wide runtime, so sessions are driven round-robin from one thread: reruns
+# never overlap, and this measures per-session rerun cost with N sessions' state alive, not contention
+# between concurrent sessions. They still share every st.cache_resource entry as browser sessions would.
+#
+# Usage: GEMINI_API_KEY=... python bench_streamlit.py --sessions 1 50 --reruns 20
+import argparse
+import statistics
+import time
+from streamlit.testing.v1 import AppTest
+
+def timed_run(app_test):
+    started = time.perf_counter()
+    app_test.run()
+    elapsed = time.perf_counter() - started
+    if app_test.exception:
+        raise RuntimeError(app_test.exception[0].message)
+    return elapsed
+
+def bench(sessions, reruns):
+    started = time.perf_counter()
+    app_tests = [AppTest.from_file("main.py", default_timeout=60) for _ in range(sessions)]
+    first_runs = [timed_run(app_test) for app_test in app_tests]
+    timings = sorted(timed_run(app_test) for _ in range(reruns) for app_test in app_tests)
+    elapsed = time.perf_counter() - started
+    p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+    print(
+        f"{sessions:>3} sessions: first run median {statistics.median(first_runs) * 1000:.1f} ms, "
+        f"rerun p50 {statistics.median(timings) * 1000:.1f} ms, "
+        f"rerun p95 {p95 * 1000:.1f} ms, wall {elapsed:.2f} s"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streamlit rerun latency benchmark")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 50])
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+    print("Sessions are driven sequentially (round-robin, one thread); reruns do not overlap")
+    for sessions in args.sessions:
+        bench(sessions, args.reruns)
@@ -3,6 +3,11 @@ import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # Load environment variables (like dotenv_values)
 load_dotenv()
@@ -11,15 +16,90 @@ if not GEMINI_API_KEY:
     st.error("GEMINI_API_KEY not found in .env file. Please add it and restart.")
     st.stop()
 
-# Configure Gemini API (once, like in FastAPI)
-genai.configure(api_key=GEMINI_API_KEY)
+SYSTEM_INSTRUCTION = """You are an expert Excel Mock Interviewer for finance, ops, and analytics roles. Evaluate responses objectively and provide constructive feedback. Always use the exact output format: Score: X/10\nFeedback: [1-2 sentences]."""
+
+# Configure Gemini API and build the model handle once per process (shared by every session)
+@st.cache_resource
+def get_model():
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel(
+        model_name="gemini-1.5-flash",  # Stable model from your FastAPI code
+        system_instruction=SYSTEM_INSTRUCTION
+    )
 
-# Knowledge base (unchanged)
+# Knowledge base, read once per process instead of on every script rerun
 import pandas as pd
-df = pd.read_excel('questions/interview_questions.xlsx')
-questions = df.to_dict(orient='records')
 
-def evaluate_answer(question, expected, user_answer, history):
+@st.cache_resource
+def load_questions():
+    df = pd.read_excel('questions/interview_questions.xlsx')
+    return df.to_dict(orient='records')
+
+questions = load_questions()
+
+# Evaluations run on a shared worker pool so the script thread never blocks on Gemini
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "8"))
+POLL_INTERVAL = 0.3
+
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=EVAL_WORKERS, thread_name_prefix="evaluate")
+
+# Chat history sent to Gemini: the last HISTORY_WINDOW_TURNS turns verbatim plus a compact
+# rolling summary of older ones, capped at roughly HISTORY_TOKEN_CAP tokens
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "3"))
+HISTORY_TOKEN_CAP = int(os.getenv("HISTORY_TOKEN_CAP", "1200"))
+SUMMARY_MAX_LINES = 10
+SEED_TURN = {"role": "model", "parts": ["Starting Excel interview evaluation session."]}
+
+# Rough token estimate (~4 characters per token) used for the cap and for logging
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def history_tokens(history):
+    return sum(estimate_tokens(part) for turn in history for part in turn["parts"])
+
+# Older turns collapse into one line each; beyond SUMMARY_MAX_LINES they fold into a running total
+def summarize_turn(user_turn, model_turn):
+    question = user_turn["parts"][0].split("\n")[0].replace("Question: ", "")[:80]
+    score = model_turn["parts"][0].split("Score: ")[1].split("/10")[0].strip() if "Score: " in model_turn["parts"][0] else "?"
+    return f"- {question} -> {score}/10"
+
+def history_summary_text(memory):
+    lines = list(memory["summary_lines"])
+    if memory["folded_turns"]:
+        lines.insert(0, f"- {memory['folded_turns']} earlier questions, total score {memory['folded_score']}")
+    return "\n".join(lines)
+
+# Store a compact version of the turn (question + answer, not the full evaluation prompt) and trim
+def remember_turn(memory, question, user_answer, model_response):
+    memory["turns"] += 1
+    memory["recent"].append({"role": "user", "parts": [f"Question: {question}\nUser Answer: {user_answer}"]})
+    memory["recent"].append({"role": "model", "parts": [model_response]})
+    while memory["recent"] and (
+        len(memory["recent"]) > 2 * HISTORY_WINDOW_TURNS
+        or history_tokens(memory["recent"]) + estimate_tokens(history_summary_text(memory)) > HISTORY_TOKEN_CAP
+    ):
+        user_turn, model_turn = memory["recent"].pop(0), memory["recent"].pop(0)
+        memory["summary_lines"].append(summarize_turn(user_turn, model_turn))
+    while len(memory["summary_lines"]) > SUMMARY_MAX_LINES:
+        folded = memory["summary_lines"].pop(0)
+        memory["folded_turns"] += 1
+        score = folded.rsplit("-> ", 1)[1].split("/10")[0]
+        memory["folded_score"] += int(float(score)) if score.replace(".", "", 1).isdigit() else 0
+
+def build_history(memory):
+    history = [SEED_TURN]
+    summary = history_summary_text(memory)
+    if summary:
+        history.append({"role": "user", "parts": [f"Summary of earlier questions in this interview:\n{summary}"]})
+        history.append({"role": "model", "parts": ["Noted."]})
+    return history + memory["recent"]
+
+def new_history_memory():
+    return {"recent": [], "summary_lines": [], "folded_turns": 0, "folded_score": 0, "turns": 0}
+
+def evaluate_answer(question, expected, user_answer, memory):
     current_time = datetime.datetime.now().strftime("%H:%M")
     current_date = datetime.datetime.now().strftime("%d %B %Y, %A")
     
@@ -39,17 +119,15 @@ def evaluate_answer(question, expected, user_answer, history):
         return {"error": "Message cannot be empty"}
     
     try:
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",  # Stable model from your FastAPI code
-            system_instruction="""You are an expert Excel Mock Interviewer for finance, ops, and analytics roles. Evaluate responses objectively and provide constructive feedback. Always use the exact output format: Score: X/10\nFeedback: [1-2 sentences]."""
-        )
-        chat_session = model.start_chat(history=history)  # Pass full history like in FastAPI
+        model = get_model()
+        history = build_history(memory)
+        prompt_tokens = history_tokens(history) + estimate_tokens(prompt)
+        logger.info(f"Turn {memory['turns'] + 1}: ~{prompt_tokens} prompt tokens ({len(history)} history turns)")
+        chat_session = model.start_chat(history=history)  # Bounded window + rolling summary
         response = chat_session.send_message(prompt)
         model_response = response.text.strip()
 
-        # Append to history (exactly like in FastAPI: "parts" list)
-        history.append({"role": "user", "parts": [prompt]})
-        history.append({"role": "model", "parts": [model_response]})
+        remember_turn(memory, question, user_answer, model_response)
         
         return model_response  # Return string for parsing
 
@@ -75,60 +153,82 @@ if "step" not in st.session_state:
         {"role": "assistant", "content": "Hello! I'm your AI Excel Interviewer. We'll go through 10 questions on Excel skills for finance, ops, and analytics. Answer each one, and I'll evaluate. Type your response below. Ready? Let's start with Question 1."},
         {"role": "assistant", "content": f"Question 1: {questions[0]['q']}"}
     ]
-    st.session_state.history = [{"role": "model", "parts": ["Starting Excel interview evaluation session."]}]  # Fixed: "parts" instead of "content"
+    st.session_state.history = new_history_memory()
 
 # Display chat history
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
 
-# User input
-user_input = st.chat_input("Your response:")
+# While an answer is pending only this fragment reruns on a timer; the full script reruns once the result is in
+@st.fragment(run_every=POLL_INTERVAL)
+def evaluation_status():
+    pending = st.session_state.get("pending")
+    if pending is not None and not pending.done():
+        with st.chat_message("assistant"):
+            st.markdown("Evaluating your answer...")
+        return
+    st.rerun()
+
+# User input (disabled while an answer is being evaluated)
+pending = st.session_state.get("pending")
+user_input = st.chat_input("Your response:", disabled=pending is not None)
 
 if user_input:
     st.session_state.messages.append({"role": "user", "content": user_input})
 
     if st.session_state.step < len(questions):
-        # Evaluate current question (FastAPI-inspired)
+        # Evaluate current question in the background (FastAPI-inspired)
         q_data = questions[st.session_state.step]
-        eval_result = evaluate_answer(q_data["q"], q_data["exp"], user_input, st.session_state.history)
-
-        # Debug: Show raw response (remove after testing)
-        with st.expander("Debug: Raw Evaluation Response"):
-            st.write(eval_result)
-
-        # Parse score and feedback (robust)
-        try:
-            score_str = eval_result.split("Score: ")[1].split("/10")[0].strip()
-            score = int(float(score_str))
-            feedback = eval_result.split("Feedback: ")[1].strip() if "Feedback: " in eval_result else "No feedback generated."
-        except (IndexError, ValueError):
-            score = 0
-            feedback = "Parsing failed; response format incorrect."
-            eval_result = f"Score: 0/10\nFeedback: {feedback}"
-
-        st.session_state.scores.append(score)
-        st.session_state.feedbacks.append(feedback)
-
-        # Prepare next step
-        st.session_state.step += 1
-
-        # Add feedback and next question (or summary)
-        if st.session_state.step < len(questions):
-            feedback_msg = f"Thanks! {eval_result}\n\nNow, Question {st.session_state.step + 1}: {questions[st.session_state.step]['q']}"
-        else:
-            avg_score = sum(st.session_state.scores) / len(st.session_state.scores)
-            basics_avg = sum(st.session_state.scores[:3]) / 3
-            advanced_avg = sum(st.session_state.scores[6:]) / 4
-            strengths = "Strong in basics" if basics_avg > 7 else "Room for improvement in basics"
-            weaknesses = "Improve advanced skills" if advanced_avg < 7 else "Solid advanced skills"
-            summary = f"""Overall Score: {avg_score:.1f}/10
+        st.session_state.pending = get_executor().submit(
+            evaluate_answer, q_data["q"], q_data["exp"], user_input, st.session_state.history
+        )
+
+    st.rerun()
+
+if pending is not None:
+    if not pending.done():
+        evaluation_status()
+        st.stop()
+
+    eval_result = pending.result()
+    st.session_state.pending = None
+
+    # Debug: Show raw response (remove after testing)
+    with st.expander("Debug: Raw Evaluation Response"):
+        st.write(eval_result)
+
+    # Parse score and feedback (robust)
+    try:
+        score_str = eval_result.split("Score: ")[1].split("/10")[0].strip()
+        score = int(float(score_str))
+        feedback = eval_result.split("Feedback: ")[1].strip() if "Feedback: " in eval_result else "No feedback generated."
+    except (IndexError, ValueError):
+        score = 0
+        feedback = "Parsing failed; response format incorrect."
+        eval_result = f"Score: 0/10\nFeedback: {feedback}"
+
+    st.session_state.scores.append(score)
+    st.session_state.feedbacks.append(feedback)
+
+    # Prepare next step
+    st.session_state.step += 1
+
+    # Add feedback and next question (or summary)
+    if st.session_state.step < len(questions):
+        feedback_msg = f"Thanks! {eval_result}\n\nNow, Question {st.session_state.step + 1}: {questions[st.session_state.step]['q']}"
+    else:
+        avg_score = sum(st.session_state.scores) / len(st.session_state.scores)
+        basics_avg = sum(st.session_state.scores[:3]) / 3
+        advanced_avg = sum(st.session_state.scores[6:]) / 4
+        strengths = "Strong in basics" if basics_avg > 7 else "Room for improvement in basics"
+        weaknesses = "Improve advanced skills" if advanced_avg < 7 else "Solid advanced skills"
+        summary = f"""Overall Score: {avg_score:.1f}/10
 Strengths: {strengths}
 Weaknesses: {weaknesses}
 Detailed Feedback:
 """ + "\n".join([f"Q{i+1}: {fb}" for i, fb in enumerate(st.session_state.feedbacks)])
-            feedback_msg = f"Thanks! {eval_result}\n\nInterview complete. Here's your summary:\n{summary}"
-
-        st.session_state.messages.append({"role": "assistant", "content": feedback_msg})
+        feedback_msg = f"Thanks! {eval_result}\n\nInterview complete. Here's your summary:\n{summary}"
 
+    st.session_state.messages.append({"role": "assistant", "content": feedback_msg})
     st.rerun()
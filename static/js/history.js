@@ -0,0 +1,63 @@
+(function () {
+  var button = document.getElementById('load-more');
+  var body = document.getElementById('history-body');
+  if (!button || !body) {
+    return;
+  }
+
+  var maxScore = button.getAttribute('data-max-score');
+
+  function titleCase(text) {
+    return text.replace(/\b\w/g, function (letter) { return letter.toUpperCase(); });
+  }
+
+  var columns = [
+    ['Date', function (entry) { return entry.timestamp; }],
+    ['Role', function (entry) { return titleCase(entry.bank); }],
+    ['Score', function (entry) { return entry.avg_score + '/' + maxScore + (entry.provisional ? ' (provisional)' : ''); }],
+    ['Change', function (entry) { return entry.change === null ? '-' : (entry.change >= 0 ? '+' : '') + entry.change.toFixed(2); }],
+    ['Questions', function (entry) { return entry.questions_answered === null ? '-' : entry.questions_answered; }],
+    ['Strengths', function (entry) { return entry.strengths || '-'; }],
+    ['Weaknesses', function (entry) { return entry.weaknesses || '-'; }]
+  ];
+
+  function appendRow(entry) {
+    var row = document.createElement('tr');
+    columns.forEach(function (column) {
+      var cell = document.createElement('td');
+      cell.setAttribute('data-label', column[0]);
+      cell.textContent = column[1](entry);
+      row.appendChild(cell);
+    });
+    body.appendChild(row);
+  }
+
+  button.addEventListener('click', function () {
+    var url = button.getAttribute('data-api-url') + '?cursor=' + encodeURIComponent(button.getAttribute('data-next-cursor'));
+    var bank = button.getAttribute('data-bank');
+    if (bank) {
+      url += '&bank=' + encodeURIComponent(bank);
+    }
+    button.disabled = true;
+    fetch(url)
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error('HTTP ' + response.status);
+        }
+        return response.json();
+      })
+      .then(function (page) {
+        page.entries.forEach(appendRow);
+        if (page.next_cursor) {
+          button.setAttribute('data-next-cursor', page.next_cursor);
+          button.disabled = false;
+        } else {
+          button.remove();
+        }
+      })
+      .catch(function () {
+        button.textContent = 'Retry';
+        button.disabled = false;
+      });
+  });
+})();
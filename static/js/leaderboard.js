@@ -0,0 +1,51 @@
+(function () {
+  var button = document.getElementById('load-more');
+  var body = document.getElementById('leaderboard-body');
+  if (!button || !body) {
+    return;
+  }
+
+  var columns = [
+    ['Rank', 'rank'],
+    ['User ID', 'user_id'],
+    ['Name', 'user_name'],
+    ['Average Score', 'avg_score'],
+    ['Last Interview', 'timestamp']
+  ];
+
+  function appendRow(entry) {
+    var row = document.createElement('tr');
+    columns.forEach(function (column) {
+      var cell = document.createElement('td');
+      cell.setAttribute('data-label', column[0]);
+      cell.textContent = entry[column[1]];
+      row.appendChild(cell);
+    });
+    body.appendChild(row);
+  }
+
+  button.addEventListener('click', function () {
+    var cursor = button.getAttribute('data-next-cursor');
+    button.disabled = true;
+    fetch(button.getAttribute('data-api-url') + '?cursor=' + encodeURIComponent(cursor))
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error('HTTP ' + response.status);
+        }
+        return response.json();
+      })
+      .then(function (page) {
+        page.entries.forEach(appendRow);
+        if (page.next_cursor) {
+          button.setAttribute('data-next-cursor', page.next_cursor);
+          button.disabled = false;
+        } else {
+          button.remove();
+        }
+      })
+      .catch(function () {
+        button.textContent = 'Retry';
+        button.disabled = false;
+      });
+  });
+})();
@@ -0,0 +1,40 @@
+(function () {
+  var answer = document.querySelector('textarea[data-speculate-url]');
+  if (!answer || !window.fetch) {
+    return;
+  }
+
+  var PAUSE_MS = 1500;
+  var MIN_LENGTH = 15;
+  var timer = null;
+  var lastSent = '';
+
+  function normalize(text) {
+    return text.trim().toLowerCase().split(/\s+/).join(' ');
+  }
+
+  function sendDraft() {
+    var draft = answer.value;
+    if (draft.trim().length < MIN_LENGTH || normalize(draft) === lastSent) {
+      return;
+    }
+    lastSent = normalize(draft);
+    // No cookies: a late reply must not overwrite the session cookie from the final submit
+    fetch(answer.getAttribute('data-speculate-url'), {
+      method: 'POST',
+      credentials: 'omit',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        step: answer.getAttribute('data-step'),
+        attempt: answer.getAttribute('data-attempt'),
+        question_index: answer.getAttribute('data-question-index'),
+        answer: draft
+      })
+    }).catch(function () {});
+  }
+
+  answer.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(sendDraft, PAUSE_MS);
+  });
+})();